@@ -0,0 +1,192 @@
+import argparse
+import json
+import math
+import os
+import sys
+from datetime import datetime
+import agent_engine
+import extraction
+import fast_parser
+
+# Batch import for chat-logged spending:
+#   python agent_batch.py messages.txt            # one message per line
+#   python agent_batch.py - < messages.jsonl      # or {"text": ..., "date": "YYYY-MM-DD"} per line
+#   python agent_engine.py --batch messages.txt   # same thing
+# Messages the fast path understands are parsed locally; the rest are packed --batch-size at a
+# time into one schema-constrained JSON model request (see extraction.py). Extracted transactions are validated and written
+# in one all-or-nothing repository.log_transactions call, then a per-message report is printed.
+# Row ids are derived from (file, line, transaction number) like the webhook's are from the
+# MessageSid, so importing the same file again writes nothing new.
+
+DEFAULT_BATCH_SIZE = 20
+
+class LLMClient:
+    """Interface: return the model's text reply for a prompt (JSON for batch prompts)"""
+    def complete(self, prompt):
+        raise NotImplementedError
+
+class GeminiClient(LLMClient):
+    """Gemini with schema-constrained JSON output (extraction.RESPONSE_SCHEMA), no tools"""
+    def __init__(self, api_key):
+        agent_engine.configure_genai(api_key)
+        self.model = agent_engine.get_extraction_model(api_key)
+
+    def complete(self, prompt):
+        # Wait as long as it takes: a batch import has no user waiting on a reply
+        with agent_engine.gemini_limiter.slot(timeout=math.inf):
+            return self.model.generate_content(prompt).text
+
+def read_messages(lines):
+    """Messages from plain text lines or JSON lines ({"text": ..., "date": ...}) with their line numbers; blank lines are skipped"""
+    messages = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+                messages.append({"text": str(record.get("text", "")), "date": record.get("date"), "line": number})
+                continue
+            except json.JSONDecodeError:
+                pass
+        messages.append({"text": line, "date": None, "line": number})
+    return messages
+
+def validate_transaction(transaction, categories, default_date):
+    """Return (table, row) for a well-formed transaction; raises ValueError otherwise"""
+    tool, kwargs, date = extraction.validate_transaction(transaction, categories)
+    date = date or default_date
+    if date:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid message date {date!r}")
+    if tool == "log_income":
+        return "income", agent_engine.income_row(**kwargs, date=date)
+    return "expenses", agent_engine.expense_row(**kwargs, date=date)
+
+def fast_path_transaction(parsed):
+    args = parsed["args"]
+    if parsed["tool"] == "log_income":
+        return {"type": "income", **args}
+    return {"type": "expense", **args}
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def run_batch(messages, client=None, categories=None, batch_size=DEFAULT_BATCH_SIZE, use_fast_path=True, dry_run=False, source=None):
+    """Extract, validate and bulk-insert the transactions in `messages`.
+
+    messages: [{"text": ..., "date": "YYYY-MM-DD" or None, "line": n}]
+    client: LLMClient for messages the fast path can't handle (None: those are reported as failed)
+    source: the file the messages were read from; row ids are derived from it and each message's
+    line (its position when "line" is missing). None gives random ids.
+    Returns one report per message: {"message", "status", "rows", "error"} where status is
+    "logged", "no_transactions", "invalid" or "failed".
+    """
+    if categories is None:
+        categories = [c["category"] for c in agent_engine.get_category_rows()]
+    reports = [{"message": m["text"], "status": None, "rows": [], "error": None} for m in messages]
+    extracted = {}  # message index -> transactions
+
+    pending = []
+    for index, message in enumerate(messages):
+        parsed = fast_parser.parse(message["text"], categories) if use_fast_path else None
+        if parsed:
+            extracted[index] = [fast_path_transaction(parsed)]
+        else:
+            pending.append(index)
+
+    for chunk in chunks(pending, max(1, batch_size)):
+        if client is None:
+            for index in chunk:
+                reports[index].update(status="failed", error="needs the LLM but no client is configured")
+            continue
+        try:
+            reply = client.complete(extraction.build_prompt([messages[i]["text"] for i in chunk], categories))
+            results = extraction.parse_response(reply, len(chunk))
+        except Exception as e:
+            for index in chunk:
+                reports[index].update(status="failed", error=f"LLM batch failed: {e}")
+            continue
+        for number, index in enumerate(chunk, 1):
+            if number in results:
+                extracted[index] = results[number]
+            else:
+                reports[index].update(status="failed", error="missing from the model's reply")
+
+    rows_by_table = {"expenses": [], "income": []}
+    for index, transactions in sorted(extracted.items()):
+        if not transactions:
+            reports[index]["status"] = "no_transactions"
+            continue
+        try:
+            validated = [validate_transaction(t, categories, messages[index]["date"]) for t in transactions]
+        except ValueError as e:
+            # All or nothing per message, so a half-understood message is never partially imported
+            reports[index].update(status="invalid", error=str(e))
+            continue
+        for ordinal, (table, row) in enumerate(validated, 1):
+            if source:
+                row["id"] = agent_engine.message_row_id(f"batch/{source}:{messages[index].get('line', index + 1)}", ordinal)
+            rows_by_table[table].append(row)
+            reports[index]["rows"].append({"table": table, **row})
+        reports[index]["status"] = "logged"
+
+    if not dry_run and (rows_by_table["expenses"] or rows_by_table["income"]):
+        # Both tables in one write, so a message with an expense and an income is never half-logged
+        result = agent_engine.db_call(agent_engine.repository.log_transactions, rows_by_table["expenses"], rows_by_table["income"])
+        if agent_engine.is_error(result):
+            for report in reports:
+                if report["status"] == "logged":
+                    report.update(status="failed", error=f"nothing saved: {result['error']}")
+    return reports
+
+def format_report(report, number):
+    status = report["status"]
+    line = f"{number:4}. [{status}] {report['message']}"
+    if report["error"]:
+        return f"{line}\n      {report['error']}"
+    for row in report["rows"]:
+        if row["table"] == "income":
+            line += f"\n      income ৳{row['amount']:,.0f} from {row['source']} on {row['date']}"
+        else:
+            line += f"\n      expense ৳{row['amount']:,.0f} {row['item']} ({row['category']}, {row['paid_by']}) on {row['date']}"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import many chat messages with batched LLM extraction")
+    parser.add_argument("path", help="Text file with one message per line (or JSON lines with text/date); - for stdin")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Messages per model request")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every message to the model")
+    parser.add_argument("--dry-run", action="store_true", help="Extract and validate without writing anything")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.path == "-":
+        messages, source = read_messages(sys.stdin), None
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            messages, source = read_messages(f), os.path.abspath(args.path)
+
+    api_key = agent_engine.GEMINI_API_KEY
+    client = GeminiClient(api_key) if api_key and api_key != "PASTE_YOUR_GEMINI_API_KEY_HERE" else None
+    if client is None:
+        print("Warning: Gemini API Key missing; only fast-path messages will be imported", file=sys.stderr)
+
+    reports = run_batch(messages, client, batch_size=args.batch_size,
+                        use_fast_path=not args.no_fast_path, dry_run=args.dry_run, source=source)
+    for number, report in enumerate(reports, 1):
+        print(json.dumps(report, ensure_ascii=False) if args.json else format_report(report, number))
+
+    counts = {}
+    for report in reports:
+        counts[report["status"]] = counts.get(report["status"], 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"\n{len(reports)} message(s): {summary}{' (dry run)' if args.dry_run else ''}", file=sys.stderr)
+    return 0 if all(r["status"] in ("logged", "no_transactions") for r in reports) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,20 @@
 import os
 import json
 import uuid
-import requests
+import functools
+import threading
+import supabase_client
+import data_access
+import fast_parser
+import response_cache
+import rate_limit
+import extraction
 from datetime import datetime
 import google.generativeai as genai
 
 # Configuration (Reusing Supabase config from secrets if possible)
-# Note: For local script use, we might need a way to load these without streamlit
-# We will try to load from .streamlit/secrets.toml manually
-def load_secrets():
-    secrets_path = os.path.join(".streamlit", "secrets.toml")
-    if os.path.exists(secrets_path):
-        try:
-             # tomllib is standard in Python 3.11+
-             import tomllib
-        except ImportError:
-             import toml as tomllib
-             
-        with open(secrets_path, "rb") as f:
-            return tomllib.load(f)
-    return {}
+# Note: For local script use, we load .streamlit/secrets.toml without streamlit
+load_secrets = supabase_client.load_secrets
 
 SECRETS = load_secrets()
 SUPABASE_URL = SECRETS.get("supabase", {}).get("url")
@@ -29,62 +24,303 @@ GEMINI_API_KEY = SECRETS.get("gemini", {}).get("api_key") or os.environ.get("GEM
 if not SUPABASE_URL or not SUPABASE_KEY:
     print("Error: Supabase credentials not found in secrets.toml")
 
-# Supabase Helpers
-def supabase_request(method, table, data=None, params=None):
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
+# Data access: shared repository (data_access.py). Category reads are cached for CATEGORIES_TTL
+# seconds; nothing else the agent reads is cached. The Streamlit app passes its own repository to
+# process_message so the agent's writes invalidate the page's cached reads.
+CATEGORIES_TTL = int(os.environ.get("AGENT_CATEGORIES_TTL", "300"))
+repository = data_access.Repository(
+    data_access.PostgrestBackend(SUPABASE_URL, SUPABASE_KEY),
+    cache=supabase_client.ReadCache(ttls={"category_budgets": CATEGORIES_TTL}, default_ttl=0)
+)
+
+def current_repository():
+    """The repository given to process_message, or the module's own outside of one"""
+    return getattr(_message_scope, "repository", None) or repository
+
+def db_call(fn, *args, **kwargs):
+    """Run a repository call; failures come back as {"error": ...} for the model and callers"""
     try:
-        response = requests.request(method, url, json=data, params=params, headers=headers, timeout=10)
-        return response.json() if response.status_code < 400 else {"error": response.text}
-    except Exception as e:
+        return fn(*args, **kwargs)
+    except supabase_client.SupabaseError as e:
         return {"error": str(e)}
 
-def fetch_categories():
-    categories = supabase_request("GET", "category_budgets", params={"select": "category,group_name"})
-    if isinstance(categories, list):
-        return [f"{c['category']} ({c['group_name']})" for c in categories]
-    return []
+def format_categories(rows):
+    return [f"{c['category']} ({c['group_name']})" for c in rows]
 
-# Agent Tools
-def log_expense(item: str, amount: float, category: str, paid_by: str = "Hadi", notes: str = ""):
-    """Logs an expense to the database."""
-    expense_data = {
-        "id": str(uuid.uuid4()),
-        "date": datetime.now().strftime('%Y-%m-%d'),
+def get_category_rows():
+    """category_budgets rows (category, group_name), cached by the repository"""
+    rows = db_call(current_repository().list_budgets, columns="category,group_name")
+    return rows if isinstance(rows, list) else []
+
+def get_categories():
+    """Category list for the prompt ("Category (GROUP)"), from the cache"""
+    return format_categories(get_category_rows())
+
+def invalidate_categories():
+    """Drop the cached category list (called when Budget Config saves)"""
+    repository.invalidate("category_budgets")
+    # Cached tool calls may name a category that was just renamed or removed
+    tool_call_cache.clear()
+
+# The model/tool setup never changes per key
+_configure_lock = threading.Lock()
+_configured_key = None
+
+def configure_genai(api_key):
+    """genai.configure is global; only redo it when the key actually changes"""
+    global _configured_key
+    with _configure_lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+
+def take_gemini_tokens(cost):
+    """Draw from the Gemini token bucket every process shares (take_rate_tokens in migration.sql)"""
+    return current_repository().call_rpc("take_rate_tokens", {"p_name": "gemini", "p_cost": cost,
+                                                              "p_rate_per_minute": rate_limit.RATE_PER_MINUTE, "p_burst": rate_limit.BURST})
+
+# One limiter per process for every Gemini call (webhook workers, batch import, Streamlit tab),
+# drawing on the bucket shared with the other processes
+gemini_limiter = rate_limit.RateLimiter(shared=take_gemini_tokens, processes=rate_limit.PROCESSES)
+BUSY_REPLY = "I'm getting a lot of messages right now and couldn't get to this one. Please try again in a minute."
+
+@functools.lru_cache(maxsize=4)
+def get_model(api_key):
+    """GenerativeModel with the agent tools, built once per API key"""
+    # Using 'gemini-1.5-flash' which is the standard name
+    return genai.GenerativeModel(
+        model_name='gemini-1.5-flash',
+        tools=[log_expense, log_income, log_transactions_tool()]
+    )
+
+# "structured": one schema-constrained JSON call; the engine writes and templates the reply itself
+# "function_calling": Gemini automatic function calling (tool choice + confirmation = two model calls)
+AGENT_MODE = os.environ.get("AGENT_MODE", "structured")
+
+@functools.lru_cache(maxsize=4)
+def get_extraction_model(api_key):
+    """GenerativeModel constrained to extraction.RESPONSE_SCHEMA, built once per API key"""
+    return genai.GenerativeModel(
+        model_name='gemini-1.5-flash',
+        generation_config=extraction.GENERATION_CONFIG
+    )
+
+# Rows written while processing a message with a known id (e.g. Twilio's MessageSid) get ids
+# derived from it, so a retried message re-sends the same ids and the insert is a no-op.
+_message_scope = threading.local()
+
+def message_row_id(message_id, ordinal):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"family-budget/message/{message_id}/{ordinal}"))
+
+def record_tool_call(name, kwargs, result):
+    """Remember a tool call made while processing a message (replayed by tool_call_cache)"""
+    calls = getattr(_message_scope, "calls", None)
+    if calls is not None:
+        calls.append((name, kwargs, result))
+
+def is_error(result):
+    return isinstance(result, dict) and "error" in result
+
+def row_id():
+    """Deterministic id inside process_message(message_id=...), a random one otherwise"""
+    message_id = getattr(_message_scope, "message_id", None)
+    if not message_id:
+        return str(uuid.uuid4())
+    _message_scope.ordinal += 1
+    return message_row_id(message_id, _message_scope.ordinal)
+
+# Row builders (shared by the tools and the batch importer)
+def expense_row(item, amount, category, paid_by="Hadi", notes="", date=None):
+    return {
+        "id": row_id(),
+        "date": date or datetime.now().strftime('%Y-%m-%d'),
         "item": item,
         "amount": amount,
         "category": category,
         "paid_by": paid_by,
         "notes": notes
     }
-    return supabase_request("POST", "expenses", data=expense_data)
 
-def log_income(source: str, amount: float, notes: str = ""):
-    """Logs income to the database."""
-    income_data = {
-        "id": str(uuid.uuid4()),
-        "date": datetime.now().strftime('%Y-%m-%d'),
+def income_row(source, amount, notes="", date=None):
+    return {
+        "id": row_id(),
+        "date": date or datetime.now().strftime('%Y-%m-%d'),
         "source": source,
         "amount": amount,
         "notes": notes
     }
-    return supabase_request("POST", "income", data=income_data)
+
+# Agent Tools
+def log_expense(item: str, amount: float, category: str, paid_by: str = "Hadi", notes: str = ""):
+    """Logs an expense to the database."""
+    result = db_call(current_repository().add_expenses, [expense_row(item, amount, category, paid_by, notes)], ignore_duplicates=True)
+    record_tool_call("log_expense", {"item": item, "amount": amount, "category": category, "paid_by": paid_by, "notes": notes}, result)
+    return result
+
+def log_income(source: str, amount: float, notes: str = ""):
+    """Logs income to the database."""
+    result = db_call(current_repository().add_income, [income_row(source, amount, notes)], ignore_duplicates=True)
+    record_tool_call("log_income", {"source": source, "amount": amount, "notes": notes}, result)
+    return result
+
+def log_transactions(transactions: list):
+    """Logs several expenses and/or incomes from one message in one write: all of them or none.
+
+    transactions: [{"type": "expense", "item", "amount", "category", "paid_by", "notes"}
+                   | {"type": "income", "source", "amount", "notes"}, ...]
+    Returns {"logged": n, "items": [{"tool", "args", "status", "error"}, ...]} plus "error" when
+    nothing was written. Item status is "ok", "invalid" or "not_saved".
+    """
+    categories = [c['category'] for c in get_category_rows()]
+    items = []
+    for transaction in transactions or []:
+        try:
+            # Tool-call arguments arrive as proto map/list wrappers; plain dicts validate the same way
+            tool, kwargs, date = extraction.validate_transaction(dict(transaction), categories)
+            items.append({"tool": tool, "args": kwargs, "date": date, "status": "ok", "error": None})
+        except (TypeError, ValueError) as e:
+            items.append({"tool": None, "args": dict(transaction) if isinstance(transaction, dict) else {}, "date": None, "status": "invalid", "error": str(e)})
+
+    result = {"logged": 0, "items": items}
+    invalid = [i for i, item in enumerate(items, 1) if item["status"] == "invalid"]
+    if not items or invalid:
+        for item in items:
+            if item["status"] == "ok":
+                item["status"] = "not_saved"
+        result["error"] = f"invalid item(s) {', '.join(map(str, invalid))}" if invalid else "no transactions"
+    else:
+        # Items without a date are dated today, like the single-row tools
+        expenses = [expense_row(**item["args"], date=item["date"]) for item in items if item["tool"] == "log_expense"]
+        income = [income_row(**item["args"], date=item["date"]) for item in items if item["tool"] == "log_income"]
+        written = db_call(current_repository().log_transactions, expenses, income)
+        if is_error(written):
+            for item in items:
+                item["status"] = "not_saved"
+            result["error"] = written["error"]
+        else:
+            result["logged"] = len(items)
+    record_tool_call("log_transactions", {"transactions": [{"type": "income" if i["tool"] == "log_income" else "expense", **i["args"],
+                                                           **({"date": i["date"]} if i["date"] else {})}
+                                                          for i in items]}, result)
+    return result
+
+def log_transactions_tool():
+    """log_transactions as a Gemini tool; its list-of-objects parameter needs an explicit schema"""
+    return genai.types.CallableFunctionDeclaration(
+        name="log_transactions",
+        description="Logs several expenses and/or incomes from one message in a single all-or-nothing write.",
+        parameters=extraction.TRANSACTIONS_PARAMETERS,
+        function=log_transactions
+    )
+
+def transactions_reply(result):
+    """Template reply for a log_transactions result, one line per item"""
+    lines = []
+    for number, item in enumerate(result["items"], 1):
+        if item["status"] == "ok":
+            lines.append(extraction.confirmation(item["tool"], item["args"]))
+        elif item["status"] == "invalid":
+            lines.append(f"❌ Item {number}: {item['error']}")
+    if "error" in result:
+        lines.append(f"Nothing was saved: {result['error']}")
+    return "\n".join(lines)
+
+TOOLS = {"log_expense": log_expense, "log_income": log_income, "log_transactions": log_transactions}
+
+def try_fast_path(text: str):
+    """Log plain one-transaction messages without the model. Returns the reply, or None to use the LLM."""
+    parsed = fast_parser.parse(text, [c['category'] for c in get_category_rows()])
+    if not parsed:
+        return None
+    result = TOOLS[parsed["tool"]](**parsed["args"])
+    if is_error(result):
+        return f"Sorry, I couldn't save that: {result['error']}"
+    return fast_parser.confirmation(parsed)
+
+# Tool calls the model made for recently seen messages, keyed on normalized text
+tool_call_cache = response_cache.ResponseCache()
+
+def names_date(kwargs):
+    """True when a recorded tool call carries a date the model extracted from the message"""
+    return any(t.get("date") for t in kwargs.get("transactions", []) if isinstance(t, dict))
+
+def try_cached_response(text: str):
+    """Replay the recorded tool calls for a message seen before (rows get today's date). Returns the reply or None."""
+    cached = tool_call_cache.get(text)
+    if cached is None:
+        return None
+    calls, reply = cached
+    for name, kwargs in calls:
+        result = TOOLS[name](**kwargs)
+        if is_error(result):
+            return f"Sorry, I couldn't save that: {result['error']}"
+    return reply
 
 # AI Engine
-def process_message(text: str, api_key: str = None):
+def process_message(text: str, api_key: str = None, use_fast_path: bool = True, message_id: str = None,
+                    use_cache: bool = True, mode: str = None, repository: data_access.Repository = None):
+    """Run the agent on one message. message_id (e.g. Twilio's MessageSid) makes its writes idempotent;
+    repository replaces the module's own for this message's reads and writes."""
+    _message_scope.message_id = message_id
+    _message_scope.ordinal = 0
+    _message_scope.calls = None
+    _message_scope.repository = repository
+    try:
+        return run_agent(text, api_key, use_fast_path, use_cache, mode or AGENT_MODE)
+    finally:
+        _message_scope.message_id = None
+        _message_scope.calls = None
+        _message_scope.repository = None
+
+def run_agent(text, api_key, use_fast_path, use_cache, mode):
+    if use_fast_path:
+        reply = try_fast_path(text)
+        if reply is not None:
+            return reply
+    if use_cache:
+        reply = try_cached_response(text)
+        if reply is not None:
+            return reply
+
     target_key = api_key or GEMINI_API_KEY
     if not target_key or target_key == "PASTE_YOUR_GEMINI_API_KEY_HERE":
         return "Error: Gemini API Key missing. Please add it to .streamlit/secrets.toml under [gemini]"
 
-    genai.configure(api_key=target_key)
-    
+    configure_genai(target_key)
+    _message_scope.calls = []
+    try:
+        if mode == "function_calling":
+            reply = run_function_calling(text, target_key)
+        else:
+            reply = run_structured(text, target_key)
+    except rate_limit.RateLimitExceeded:
+        return BUSY_REPLY
+
+    # Cache only messages that logged something and fully succeeded; questions and failures always go to the model.
+    # Replays are dated today, so a message naming its own day ("bus 40 yesterday") is never cached.
+    calls = _message_scope.calls
+    if use_cache and calls and not any(is_error(result) or names_date(kwargs) for _, kwargs, result in calls):
+        tool_call_cache.set(text, [(name, kwargs) for name, kwargs, _ in calls], reply)
+    return reply
+
+def run_structured(text, api_key):
+    """One model call for the transactions as JSON; writes and the reply happen locally"""
+    categories = [c['category'] for c in get_category_rows()]
+    with gemini_limiter.slot():
+        response = get_extraction_model(api_key).generate_content(extraction.build_prompt([text], categories))
+    try:
+        transactions = extraction.parse_response(response.text, 1).get(1, [])
+    except ValueError as e:
+        return f"Sorry, I couldn't understand that: {e}"
+    if not transactions:
+        return extraction.NO_TRANSACTIONS_REPLY
+    # Every transaction in the message goes out in one all-or-nothing write
+    return transactions_reply(log_transactions(transactions))
+
+def run_function_calling(text, api_key):
+    """Gemini picks and calls the tools, then writes the confirmation (two model calls)"""
     # Get available categories for context
-    cats = fetch_categories()
+    cats = get_categories()
     categories_str = ", ".join(cats)
     
     prompt = f"""
@@ -96,25 +332,27 @@ def process_message(text: str, api_key: str = None):
     1. If the user mentions spending money, use 'log_expense'.
     2. Try to match the category to the most relevant one from the list. If it doesn't fit, use 'Others'.
     3. If the user mentions receiving money, use 'log_income'.
-    4. Default 'paid_by' to 'Hadi' unless 'Ruhi' is mentioned.
-    5. Be concise and confirm the action.
+    4. If the message has more than one transaction, call 'log_transactions' once with all of them instead.
+    5. Default 'paid_by' to 'Hadi' unless 'Ruhi' is mentioned.
+    6. Be concise and confirm the action.
     
     Text: "{text}"
     """
     
-    # Using 'gemini-1.5-flash' which is the standard name
-    model = genai.GenerativeModel(
-        model_name='gemini-1.5-flash',
-        tools=[log_expense, log_income]
-    )
+    model = get_model(api_key)
     
     chat = model.start_chat(enable_automatic_function_calling=True)
-    response = chat.send_message(prompt)
-    
+    # Automatic function calling makes two model requests per message (tool call + reply)
+    with gemini_limiter.slot(cost=2):
+        response = chat.send_message(prompt)
     return response.text
 
 if __name__ == "__main__":
     import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        # python agent_engine.py --batch messages.txt  (or - for stdin); see agent_batch.py
+        import agent_batch
+        sys.exit(agent_batch.main(sys.argv[2:]))
     if len(sys.argv) > 1:
         user_input = " ".join(sys.argv[1:])
         print(f"Processing: {user_input}")
@@ -122,3 +360,4 @@ if __name__ == "__main__":
         print(f"Result: {result}")
     else:
         print("Usage: python agent_engine.py 'Your message here'")
+        print("       python agent_engine.py --batch messages.txt   (one message per line, - for stdin)")
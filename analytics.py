@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
+
+# Dashboard aggregates computed with vectorized pandas operations.
+# Rows are loaded once into a typed frame (datetime64 dates, categorical category / payer, float
+# amounts), and every total, breakdown and trend bucket is a groupby / resample over that frame.
+# See benchmarks/analytics_benchmark.py for the comparison with the old per-row loops.
+
+PAYERS = ("Hadi", "Ruhi")
+DEFAULT_ICON = "📦"
+EXPENSE_COLUMNS = ["date", "category", "paid_by", "amount"]
+INCOME_COLUMNS = ["date", "amount"]
+
+def expense_frame(expenses):
+    """Expense rows (PostgREST dicts) -> typed DataFrame with EXPENSE_COLUMNS"""
+    frame = pd.DataFrame(expenses, columns=EXPENSE_COLUMNS)
+    return frame.assign(
+        date=pd.to_datetime(frame["date"], format="%Y-%m-%d"),
+        category=frame["category"].astype("category"),
+        paid_by=frame["paid_by"].astype("category"),
+        amount=pd.to_numeric(frame["amount"]).astype("float64"),
+    )
+
+def income_frame(income):
+    frame = pd.DataFrame(income, columns=INCOME_COLUMNS)
+    return frame.assign(
+        date=pd.to_datetime(frame["date"], format="%Y-%m-%d"),
+        amount=pd.to_numeric(frame["amount"]).astype("float64"),
+    )
+
+def month_summary(expenses, income):
+    """Month summary in the shape of app.summarize_month, from typed expense / income frames"""
+    amounts = expenses["amount"]
+    return {
+        "total_spent": float(amounts.sum()),
+        "total_income": float(income["amount"].sum()),
+        "by_category": amounts.groupby(expenses["category"], observed=True).sum().to_dict(),
+        "by_payer": amounts.groupby(expenses["paid_by"], observed=True).sum().to_dict(),
+    }
+
+def totals_frame(totals, label, include=()):
+    """{name: amount} -> two-column DataFrame for the pie / bar charts; `include` names always get a row"""
+    series = pd.Series(totals, dtype="float64")
+    if include:
+        series = series.reindex(pd.Index(include).union(series.index, sort=False), fill_value=0.0)
+    return pd.DataFrame({label: series.index, "Amount": series.to_numpy()})
+
+def budget_progress(category_budgets, by_category):
+    """One row per budget with spent, percentage of limit and bar width, in category_budgets order"""
+    frame = pd.DataFrame(category_budgets, columns=["category", "group_name", "limit_amount", "icon"])
+    spent = pd.Series(by_category, dtype="float64")
+    limit = pd.to_numeric(frame["limit_amount"]).astype("float64").fillna(0.0)
+    frame["limit_amount"] = limit
+    frame["icon"] = frame["icon"].fillna(DEFAULT_ICON)
+    frame["spent"] = frame["category"].map(spent).fillna(0.0)
+    frame["percentage"] = np.where(limit > 0, frame["spent"] / limit.where(limit > 0, 1.0) * 100, 0.0)
+    frame["width"] = frame["percentage"].clip(upper=100)
+    return frame
+
+def trend_skeleton(time_frame, today=None):
+    """Zero-filled {period: 0} map of the buckets shown for a time frame, plus the earliest date they cover"""
+    today = today or datetime.now()
+    data_map = {}
+    since = today
+
+    if time_frame == 'daily':
+        # Last 30 days
+        for i in range(30):
+            date = today - timedelta(days=29-i)
+            key = date.strftime('%Y-%m-%d')
+            data_map[key] = 0
+        since = today - timedelta(days=29)
+    elif time_frame == 'weekly':
+        # Last 12 weeks
+        for i in range(12):
+            week_start = today - timedelta(weeks=11-i)
+            week_num = week_start.isocalendar()[1]
+            key = f"{week_start.year}-W{week_num}"
+            data_map[key] = 0
+        oldest = today - timedelta(weeks=11)
+        since = oldest - timedelta(days=oldest.weekday())  # Monday of that ISO week
+    elif time_frame == 'monthly':
+        # Last 12 months
+        for i in range(12):
+            month_date = today - relativedelta(months=11-i)
+            key = month_date.strftime('%Y-%m')
+            data_map[key] = 0
+        since = (today - relativedelta(months=11)).replace(day=1)
+    elif time_frame == 'quarterly':
+        # Last 4 quarters
+        for i in range(4):
+            quarter_date = today - relativedelta(months=9-i*3)
+            quarter = (quarter_date.month - 1) // 3 + 1
+            key = f"{quarter_date.year}-Q{quarter}"
+            data_map[key] = 0
+        oldest = today - relativedelta(months=9)
+        since = oldest.replace(month=(oldest.month - 1) // 3 * 3 + 1, day=1)
+
+    return data_map, since.strftime('%Y-%m-%d')
+
+def period_totals(expenses, time_frame):
+    """pd.Series of spending per trend bucket, indexed by the same labels as trend_skeleton"""
+    dated = expenses.set_index("date")["amount"]
+    if time_frame == 'weekly':
+        # Keyed "<calendar year>-W<ISO week>" like trend_skeleton, so weeks spanning New Year stay split
+        iso_week = dated.index.isocalendar().week.to_numpy()
+        totals = dated.groupby([dated.index.year, iso_week]).sum()
+        labels = [f"{year}-W{week}" for year, week in totals.index]
+    elif time_frame == 'daily':
+        totals = dated.resample("D").sum()
+        labels = totals.index.strftime('%Y-%m-%d')
+    elif time_frame == 'monthly':
+        totals = dated.resample("MS").sum()
+        labels = totals.index.strftime('%Y-%m')
+    elif time_frame == 'quarterly':
+        totals = dated.resample("QS").sum()
+        labels = [f"{year}-Q{quarter}" for year, quarter in zip(totals.index.year, totals.index.quarter)]
+    else:
+        return pd.Series(dtype="float64")
+    return pd.Series(totals.to_numpy(), index=labels)
+
+def spending_trend(expenses, time_frame, today=None):
+    """[(period, amount)] for the trend chart, zero-filled to the trend_skeleton buckets"""
+    data_map, since = trend_skeleton(time_frame, today)
+    recent = expenses[expenses["date"] >= pd.Timestamp(since)]
+    if not recent.empty:
+        totals = period_totals(recent, time_frame)
+        for key, amount in totals[totals.index.isin(list(data_map))].items():
+            data_map[key] += float(amount)
+    return [(k, v) for k, v in sorted(data_map.items())]
@@ -0,0 +1,86 @@
+"""Batch import vs one message per call, with a local fake LLM and a fake Supabase.
+
+The fake client answers batch prompts by pulling "<words> <amount>" pairs out of each numbered
+message after sleeping --llm-latency; rows go to data_access.MemoryBackend, which sleeps
+--db-latency per request.
+The per-message baseline is what agent_engine.process_message costs for the same messages:
+one model call (two round trips with automatic function calling) and one POST per transaction.
+
+Usage:
+    python benchmarks/agent_batch_benchmark.py --messages 300 --batch-size 20 --llm-latency 1.0
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import agent_batch
+import agent_engine
+import data_access
+
+ITEMS = [("rice", "Groceries & Food"), ("rickshaw", "Office Commute (Hadi)"), ("diapers", "Yusra (Diapers, Wipes, Baby Care)"),
+         ("dinner out", "Family Hangout"), ("gym", "Hadi"), ("shoes", "Other"), ("wifi", "Internet / Phone / Subscriptions")]
+CATEGORIES = sorted({category for _, category in ITEMS})
+
+class FakeClient(agent_batch.LLMClient):
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def complete(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        categories = dict(ITEMS)
+        results = []
+        for number, text in re.findall(r'^(\d+)\. (".*")$', prompt, re.MULTILINE):
+            transactions = []
+            for item, amount in re.findall(r"([a-z ]+?) (\d+)", json.loads(text)):
+                item = item.strip()
+                transactions.append({"type": "expense", "item": item, "amount": int(amount),
+                                     "category": categories.get(item, "Other"), "paid_by": "Hadi"})
+            results.append({"message": int(number), "transactions": transactions})
+        return json.dumps({"results": results})
+
+def make_messages(count, seed=7):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        picks = rng.sample(ITEMS, rng.randint(1, 3))
+        # "and"-joined messages always need the model, like real multi-item chat lines
+        messages.append({"text": " and ".join(f"{item} {rng.randint(20, 3000)}" for item, _ in picks) + " and done", "date": None})
+    return messages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=agent_batch.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per model round trip")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Seconds per Supabase request")
+    args = parser.parse_args()
+
+    backend = data_access.MemoryBackend(latency=args.db_latency)
+    agent_engine.repository = data_access.Repository(backend)
+
+    messages = make_messages(args.messages)
+    client = FakeClient(args.llm_latency)
+    start = time.perf_counter()
+    reports = agent_batch.run_batch(messages, client, categories=CATEGORIES, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    rows = sum(len(r["rows"]) for r in reports)
+    logged = sum(1 for r in reports if r["status"] == "logged")
+    baseline = len(messages) * 2 * args.llm_latency + rows * args.db_latency
+    inserts = sum(m["calls"] for name, m in agent_engine.repository.stats().items() if name.startswith("POST"))
+    stored = ", ".join(f"{table}: {len(table_rows)} rows" for table, table_rows in backend.tables.items())
+    print(f"Messages: {len(messages)}   transactions: {rows}   logged: {logged}")
+    print(f"Batched:     {client.calls} model calls, {inserts} inserts ({stored}) in {elapsed:.1f} s")
+    print(f"Per message: {len(messages)} model calls (x2 round trips), {rows} inserts, ~{baseline:.1f} s")
+    print(f"Speedup:     {baseline / elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
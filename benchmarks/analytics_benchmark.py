@@ -0,0 +1,163 @@
+"""Dashboard aggregation: the vectorized analytics module vs the per-row Python loops it replaced.
+
+Generates synthetic expense rows in the shape PostgREST returns (ISO date strings, float amounts)
+spread over the last --years years, then times the dashboard's client-side work both ways: the
+month summary, the budget progress rows and all four trend time frames. The analytics timing
+includes building the typed DataFrame. The results are checked against each other before timing.
+
+Usage:
+    python benchmarks/analytics_benchmark.py [--rows 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import analytics
+
+TIME_FRAMES = ("daily", "weekly", "monthly", "quarterly")
+
+def default_budgets():
+    """category_budgets seed rows from migration.sql"""
+    with open(os.path.join(ROOT, "migration.sql"), encoding="utf-8") as f:
+        sql = f.read()
+    block = sql[sql.index("INSERT INTO category_budgets"):]
+    block = block[:block.index(";")]
+    return [
+        {"category": name.replace("''", "'"), "group_name": group, "limit_amount": float(limit), "icon": icon}
+        for name, group, limit, icon in re.findall(r"\('((?:[^']|'')*)', '([A-Z]+)', ([\d.]+), '([^']*)'\)", block)
+    ]
+
+def make_expenses(count, categories, today, years, seed=7):
+    rng = random.Random(seed)
+    days = int(365 * years)
+    return [
+        {
+            "date": (today - timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d'),
+            "category": rng.choice(categories),
+            "paid_by": "Ruhi" if rng.random() < 0.4 else "Hadi",
+            "amount": round(rng.uniform(20, 5000), 2),
+        }
+        for _ in range(count)
+    ]
+
+# Mirrors of the loops app.py used before analytics.py
+
+def loop_month_summary(expenses, income):
+    by_category, by_payer = {}, {}
+    for expense in expenses:
+        by_category[expense['category']] = by_category.get(expense['category'], 0) + expense['amount']
+        by_payer[expense['paid_by']] = by_payer.get(expense['paid_by'], 0) + expense['amount']
+    return {
+        "total_spent": sum(e['amount'] for e in expenses),
+        "total_income": sum(i['amount'] for i in income),
+        "by_category": by_category,
+        "by_payer": by_payer,
+    }
+
+def loop_budget_progress(category_budgets, category_spent):
+    grouped_budgets = {}
+    for budget in category_budgets:
+        grouped_budgets.setdefault(budget['group_name'], []).append(budget)
+    progress = []
+    for group, budgets in grouped_budgets.items():
+        for budget in budgets:
+            spent = category_spent.get(budget['category'], 0)
+            limit = budget['limit_amount']
+            percentage = (spent / limit * 100) if limit > 0 else 0
+            progress.append((budget['category'], spent, percentage, min(percentage, 100)))
+    return progress
+
+def loop_trend(expenses, time_frame, today):
+    data_map, _ = analytics.trend_skeleton(time_frame, today)
+    for expense in expenses:
+        exp_date = datetime.strptime(expense['date'], '%Y-%m-%d')
+        key = None
+        if time_frame == 'daily':
+            key = exp_date.strftime('%Y-%m-%d')
+        elif time_frame == 'weekly':
+            week_num = exp_date.isocalendar()[1]
+            key = f"{exp_date.year}-W{week_num}"
+        elif time_frame == 'monthly':
+            key = exp_date.strftime('%Y-%m')
+        elif time_frame == 'quarterly':
+            quarter = (exp_date.month - 1) // 3 + 1
+            key = f"{exp_date.year}-Q{quarter}"
+        if key and key in data_map:
+            data_map[key] = data_map.get(key, 0) + expense['amount']
+    return [(k, v) for k, v in sorted(data_map.items())]
+
+def run_loops(expenses, income, budgets, today):
+    summary = loop_month_summary(expenses, income)
+    progress = loop_budget_progress(budgets, summary["by_category"])
+    trends = {frame: loop_trend(expenses, frame, today) for frame in TIME_FRAMES}
+    return summary, progress, trends
+
+def run_vectorized(expenses, income, budgets, today):
+    frame = analytics.expense_frame(expenses)
+    summary = analytics.month_summary(frame, analytics.income_frame(income))
+    progress = analytics.budget_progress(budgets, summary["by_category"])
+    trends = {name: analytics.spending_trend(frame, name, today) for name in TIME_FRAMES}
+    return summary, progress, trends
+
+def close(a, b):
+    return abs(a - b) <= 1e-6 * max(1.0, abs(a), abs(b))
+
+def check_parity(loops, vectorized):
+    (l_summary, l_progress, l_trends), (v_summary, v_progress, v_trends) = loops, vectorized
+    checks = {
+        "total_spent": close(l_summary["total_spent"], v_summary["total_spent"]),
+        "by_category": l_summary["by_category"].keys() == v_summary["by_category"].keys()
+            and all(close(v, v_summary["by_category"][k]) for k, v in l_summary["by_category"].items()),
+        "by_payer": l_summary["by_payer"].keys() == v_summary["by_payer"].keys()
+            and all(close(v, v_summary["by_payer"][k]) for k, v in l_summary["by_payer"].items()),
+        "budget progress": [row[0] for row in l_progress] == list(v_progress["category"])
+            and all(close(row[2], pct) for row, pct in zip(l_progress, v_progress["percentage"])),
+    }
+    for name in TIME_FRAMES:
+        checks[f"trend {name}"] = [k for k, _ in l_trends[name]] == [k for k, _ in v_trends[name]] \
+            and all(close(a, b) for (_, a), (_, b) in zip(l_trends[name], v_trends[name]))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"  MISMATCH: {', '.join(failed)}")
+    return not failed
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--years", type=float, default=3, help="Spread the rows over this many years")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the best time is reported")
+    args = parser.parse_args()
+
+    budgets = default_budgets()
+    categories = [b["category"] for b in budgets]
+    today = datetime.now()
+    ok = True
+
+    print(f"{'rows':>10} {'loops':>10} {'vectorized':>12} {'speedup':>8}")
+    for count in args.rows:
+        expenses = make_expenses(count, categories, today, args.years)
+        income = [{"date": e["date"], "amount": e["amount"] * 10} for e in expenses[:max(count // 20, 1)]]
+        ok &= check_parity(run_loops(expenses, income, budgets, today), run_vectorized(expenses, income, budgets, today))
+        loops = best_time(lambda: run_loops(expenses, income, budgets, today), args.repeat)
+        vectorized = best_time(lambda: run_vectorized(expenses, income, budgets, today), args.repeat)
+        print(f"{count:>10,} {loops * 1000:>8.1f}ms {vectorized * 1000:>10.1f}ms {loops / vectorized:>7.1f}x")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
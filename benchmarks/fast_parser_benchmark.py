@@ -0,0 +1,98 @@
+"""Accuracy and latency of the fast-path parser on a labelled corpus.
+
+Each line of fast_parser_corpus.jsonl holds a message and the transactions it should produce.
+Messages with exactly one transaction may be handled by the fast path; everything else, and any
+message marked "fast_path": false (negations, corrections, questions, junk words), must fall
+back to the LLM. Reports how many messages skip the LLM, how many of those were parsed
+correctly, any wrong parses (the costly case: a bad row is written without the LLM) and the
+parse time, plus the latency saved assuming --llm-latency seconds per LLM round trip.
+
+Usage:
+    python benchmarks/fast_parser_benchmark.py [--corpus PATH] [--llm-latency 1.8] [--verbose]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import fast_parser
+
+def default_categories():
+    """Category names from the seed data in migration.sql"""
+    with open(os.path.join(ROOT, "migration.sql"), encoding="utf-8") as f:
+        sql = f.read()
+    block = sql[sql.index("INSERT INTO category_budgets"):]
+    block = block[:block.index(";")]
+    return [name.replace("''", "'") for name in re.findall(r"\('((?:[^']|'')*)', '[A-Z]+'", block)]
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def matches(parsed, expected):
+    args = parsed["args"]
+    if parsed["tool"] != expected["tool"] or abs(args["amount"] - expected["amount"]) > 0.005:
+        return False
+    if expected["tool"] == "log_income":
+        return True
+    return args["category"] == expected["category"] and args["paid_by"] == expected["paid_by"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_parser_corpus.jsonl"))
+    parser.add_argument("--llm-latency", type=float, default=1.8, help="Seconds per message on the LLM path")
+    parser.add_argument("--repeat", type=int, default=200, help="Parse the corpus this many times for timing")
+    parser.add_argument("--verbose", action="store_true", help="Print every message and its outcome")
+    args = parser.parse_args()
+
+    categories = default_categories()
+    corpus = load_corpus(args.corpus)
+
+    hits = correct = 0
+    wrong, missed = [], []
+    for example in corpus:
+        parsed = fast_parser.parse(example["text"], categories)
+        expected = example["transactions"]
+        if parsed is None:
+            if len(expected) == 1:
+                missed.append(example["text"])
+            outcome = "-> LLM"
+        else:
+            hits += 1
+            if example.get("fast_path", True) and len(expected) == 1 and matches(parsed, expected[0]):
+                correct += 1
+                outcome = "ok"
+            else:
+                wrong.append((example["text"], parsed))
+                outcome = "WRONG"
+        if args.verbose:
+            print(f"{outcome:7} {example['text']}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for example in corpus:
+            fast_parser.parse(example["text"], categories)
+    per_message = (time.perf_counter() - start) / (args.repeat * len(corpus))
+
+    total = len(corpus)
+    single = sum(1 for example in corpus if len(example["transactions"]) == 1)
+    print(f"Corpus:            {total} messages ({single} single-transaction), {len(categories)} categories")
+    print(f"Fast path hits:    {hits} ({hits / total:.0%} of all, {hits / single:.0%} of single-transaction)")
+    print(f"Correct hits:      {correct} ({correct / hits:.1%})" if hits else "Correct hits:      0")
+    print(f"Wrong hits:        {len(wrong)}")
+    print(f"Fell back to LLM:  {total - hits} ({len(missed)} of them single-transaction)")
+    print(f"Parse time:        {per_message * 1e6:,.0f} µs per message")
+    saved = hits * args.llm_latency
+    print(f"Latency saved:     {saved:.1f} s over the corpus "
+          f"(mean {saved / total * 1000:,.0f} ms per message at {args.llm_latency:.1f} s per LLM call)")
+    for text, parsed in wrong:
+        print(f"  WRONG: {text!r} -> {parsed['tool']} {parsed['args']}")
+    return 1 if wrong else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Websocket deltas and payload bytes for the category breakdown and History lists, before and after.
+
+Runs each section headlessly through Streamlit's AppTest twice: rendered the old way (an expander
+per group and an st.markdown per budget; a container, columns, markdown and two buttons per History
+row) and through html_blocks as one markdown block. Every ForwardMsg delta the script run produces
+is counted, along with its serialized protobuf size, i.e. what goes over the websocket.
+
+Usage:
+    python benchmarks/render_payload_benchmark.py [--budgets 30] [--rows 50]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+try:
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    from streamlit.testing.v1 import AppTest
+except ImportError:
+    sys.exit("streamlit is required: pip install -r requirements.txt")
+
+# AppTest runs the function's source as a script, so each one imports what it needs itself
+
+def breakdown_before(budgets, by_category):
+    import streamlit as st
+    import analytics
+    import html_blocks
+    progress = analytics.budget_progress(budgets, by_category)
+    for group, rows in progress.groupby("group_name", sort=False):
+        with st.expander(f"📁 {group}", expanded=True):
+            for budget in rows.itertuples(index=False):
+                st.markdown(html_blocks.budget_row(budget), unsafe_allow_html=True)
+
+def breakdown_after(budgets, by_category):
+    import streamlit as st
+    import analytics
+    import html_blocks
+    progress = analytics.budget_progress(budgets, by_category)
+    st.markdown(html_blocks.budget_breakdown(progress), unsafe_allow_html=True)
+
+def history_before(expenses, category_icons):
+    import streamlit as st
+    import html_blocks
+    for expense in expenses:
+        with st.container():
+            row_col1, row_col2 = st.columns([5, 1])
+            with row_col1:
+                st.markdown(html_blocks.expense_list([expense], category_icons), unsafe_allow_html=True)
+            with row_col2:
+                st.button("✏️", key=f"edit_btn_{expense['id']}", help="Edit")
+                st.button("🗑️", key=f"delete_btn_{expense['id']}", help="Delete")
+
+def history_after(expenses, category_icons):
+    import streamlit as st
+    import html_blocks
+    labels = {e['id']: f"{e['date']} • {e['item']} • ৳{e['amount']:,.0f}" for e in expenses}
+    col_select, col_edit, col_delete = st.columns([4, 1, 1])
+    with col_select:
+        st.selectbox("Transaction", list(labels), format_func=labels.get, key="history_selected_expenses", label_visibility="collapsed")
+    with col_edit:
+        st.button("✏️ Edit", key="history_edit_expenses", use_container_width=True)
+    with col_delete:
+        st.button("🗑️ Delete", key="history_delete_expenses", use_container_width=True)
+    st.markdown(html_blocks.expense_list(expenses, category_icons), unsafe_allow_html=True)
+
+def measure(script, **kwargs):
+    """(delta count, payload bytes) of one script run"""
+    deltas = []
+    original = ForwardMsgQueue.enqueue
+
+    def recording_enqueue(queue, msg):
+        if msg.HasField("delta"):
+            deltas.append(msg.ByteSize())
+        original(queue, msg)
+
+    ForwardMsgQueue.enqueue = recording_enqueue
+    try:
+        at = AppTest.from_function(script, kwargs=kwargs, default_timeout=60)
+        at.run()
+    finally:
+        ForwardMsgQueue.enqueue = original
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return len(deltas), sum(deltas)
+
+def sample_budgets(count):
+    groups = ["HOUSING", "FOOD", "TRANSPORT", "HEALTH", "FAMILY", "LIFESTYLE"]
+    return [
+        {"category": f"Category {i}", "group_name": groups[i % len(groups)], "limit_amount": 1000 + 250 * i, "icon": "🏷️"}
+        for i in range(count)
+    ]
+
+def sample_expenses(count, categories, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"bench-{i}",
+            "date": (date.today() - timedelta(days=i // 3)).strftime('%Y-%m-%d'),
+            "item": rng.choice(["Groceries", "Rickshaw", "Pharmacy", "Dinner out", "Internet bill"]),
+            "category": rng.choice(categories),
+            "paid_by": rng.choice(["Hadi", "Ruhi"]),
+            "amount": round(rng.uniform(50, 5000), 2),
+            "notes": "split with family" if i % 4 == 0 else "",
+            "recurrence_active": 1 if i % 10 == 0 else 0,
+        }
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", type=int, default=30, help="Budget categories in the breakdown")
+    parser.add_argument("--rows", type=int, default=50, help="Rows in the History list (one page is 50)")
+    args = parser.parse_args()
+
+    budgets = sample_budgets(args.budgets)
+    rng = random.Random(3)
+    by_category = {b["category"]: rng.uniform(0, 1.3) * b["limit_amount"] for b in budgets}
+    expenses = sample_expenses(args.rows, [b["category"] for b in budgets])
+    icons = {b["category"]: b["icon"] for b in budgets}
+
+    sections = {
+        f"Category breakdown ({args.budgets} budgets)": (breakdown_before, breakdown_after, {"budgets": budgets, "by_category": by_category}),
+        f"History ({args.rows} expenses)": (history_before, history_after, {"expenses": expenses, "category_icons": icons}),
+    }
+    print(f"{'section':<34} {'':>6} {'deltas':>7} {'bytes':>9}")
+    for name, (before, after, kwargs) in sections.items():
+        before_deltas, before_bytes = measure(before, **kwargs)
+        after_deltas, after_bytes = measure(after, **kwargs)
+        print(f"{name:<34} {'before':>6} {before_deltas:>7} {before_bytes:>9,}")
+        print(f"{'':<34} {'after':>6} {after_deltas:>7} {after_bytes:>9,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Load test for the /whatsapp webhook with a local stub LLM and a stub Supabase.
+
+Starts a stub PostgREST server and the real webhook app (uvicorn) in-process, swaps the Gemini
+models for stubs that sleep --llm-latency per round trip (two for function calling, one for
+structured mode) and log the expense through agent_engine (against the stub Supabase), and
+records replies with an in-memory MessageSender. It fires --messages POSTs with --concurrency
+parallel clients and reports ack latency (what Twilio waits for), end-to-end latency (POST to
+reply sent) and throughput.
+
+Usage:
+    python benchmarks/webhook_load_benchmark.py --messages 200 --concurrency 20 --llm-latency 0.8
+    python benchmarks/webhook_load_benchmark.py --mode function_calling   # compare round trips
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests
+import uvicorn
+import agent_engine
+import data_access
+import idempotency
+import messaging
+import rate_limit
+import webhook_agent
+
+class StubSupabase(BaseHTTPRequestHandler):
+    """Answers the handful of PostgREST calls the agent makes"""
+    latency = 0.02
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, payload):
+        time.sleep(self.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply([{"category": "Groceries & Food", "group_name": "LIVING"}, {"category": "Other", "group_name": "OTHERS"}])
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        row = json.loads(self.rfile.read(length) or b"{}")
+        self.reply(row if isinstance(row, list) else [row])
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubChat:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send_message(self, prompt):
+        # Two model round trips (tool choice, then confirmation) around the local tool call
+        time.sleep(self.latency)
+        text = re.search(r'Text: "(.*)"', prompt).group(1)
+        amount = float(re.search(r"\d+", text).group())
+        agent_engine.log_expense(item=text, amount=amount, category="Groceries & Food")
+        time.sleep(self.latency)
+        return StubResponse(f"Logged ৳{amount:,.0f} for {text}")
+
+class StubModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def start_chat(self, **kwargs):
+        return StubChat(self.latency)
+
+    def generate_content(self, prompt):
+        # Structured mode: one round trip returning the transactions as JSON
+        time.sleep(self.latency)
+        text = json.loads(re.search(r'^1\. (".*")$', prompt, re.MULTILINE).group(1))
+        amount = float(re.search(r"\d+", text).group())
+        transaction = {"type": "expense", "item": text, "amount": amount, "category": "Groceries & Food", "paid_by": "Hadi"}
+        return StubResponse(json.dumps({"results": [{"message": 1, "transactions": [transaction]}]}))
+
+class RecordingSender(messaging.MessageSender):
+    def __init__(self):
+        self.replies = {}
+        self.sends = 0
+        self.lock = threading.Lock()
+
+    def send(self, to, body, from_=None):
+        with self.lock:
+            self.replies.setdefault(to, time.perf_counter())
+            self.sends += 1
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Seconds the stub model takes per round trip")
+    parser.add_argument("--mode", choices=["structured", "function_calling"], default="structured", help="Agent mode (see agent_engine.AGENT_MODE)")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Seconds the stub Supabase takes per request")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-rpm", type=float, default=100000, help="Gemini limiter rate (requests per minute)")
+    parser.add_argument("--llm-in-flight", type=int, default=rate_limit.MAX_IN_FLIGHT, help="Gemini limiter max in flight")
+    parser.add_argument("--retry-rate", type=float, default=0.0, help="Fraction of messages Twilio re-delivers with the same MessageSid")
+    parser.add_argument("--fast-path", action="store_true", help="Let plain messages skip the stub LLM via fast_parser")
+    args = parser.parse_args()
+
+    StubSupabase.latency = args.db_latency
+    stub_db = ThreadingHTTPServer(("127.0.0.1", 0), StubSupabase)
+    threading.Thread(target=stub_db.serve_forever, daemon=True).start()
+
+    # Real PostgREST backend (pooled HTTP) pointed at the stub server
+    agent_engine.repository.backend = data_access.PostgrestBackend(f"http://127.0.0.1:{stub_db.server_address[1]}", "stub")
+    webhook_agent.dedup_store = idempotency.IdempotencyStore()
+    agent_engine.GEMINI_API_KEY = "stub"
+    agent_engine.configure_genai = lambda api_key: None
+    agent_engine.get_model = lambda api_key: StubModel(args.llm_latency)
+    agent_engine.get_extraction_model = lambda api_key: StubModel(args.llm_latency)
+    agent_engine.AGENT_MODE = args.mode
+    agent_engine.gemini_limiter = rate_limit.RateLimiter(rate_per_minute=args.llm_rpm, burst=max(2, int(args.llm_rpm / 60)),
+                                                         max_in_flight=args.llm_in_flight)
+    if not args.fast_path:
+        # The test messages are all fast-path shaped; measure the LLM path unless asked not to
+        webhook_agent.message_handler = functools.partial(agent_engine.process_message, use_fast_path=False, use_cache=False)
+    sender = RecordingSender()
+    webhook_agent.message_sender = sender
+
+    server = uvicorn.Server(uvicorn.Config(webhook_agent.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{args.port}/whatsapp"
+    sent_at, ack_latencies, retries = {}, [], []
+
+    def post(i):
+        to = f"whatsapp:+1555{i:07d}"
+        start = time.perf_counter()
+        sent_at[to] = start
+        form = {"Body": f"groceries {100 + i}", "From": to, "To": "whatsapp:+15550000000", "MessageSid": f"SM{i:032d}"}
+        response = requests.post(url, data=form, timeout=30)
+        response.raise_for_status()
+        ack_latencies.append(time.perf_counter() - start)
+        if random.random() < args.retry_rate:
+            retries.append(requests.post(url, data=form, timeout=30).status_code)
+
+    print(f"Posting {args.messages} messages with {args.concurrency} concurrent clients "
+          f"(LLM {args.llm_latency * 1000:.0f} ms, DB {args.db_latency * 1000:.0f} ms, "
+          f"{webhook_agent.WORKERS} workers, queue {webhook_agent.QUEUE_SIZE}, "
+          f"fast path {'on' if args.fast_path else 'off'}, {args.mode} mode)")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(post, range(args.messages)))
+    acked = time.perf_counter() - start
+
+    deadline = time.time() + args.messages * args.llm_latency * 2 + 30
+    while len(sender.replies) < len(sent_at) and time.time() < deadline:
+        time.sleep(0.05)
+    finished = time.perf_counter() - start
+
+    e2e = [sender.replies[to] - sent_at[to] for to in sender.replies]
+    print(f"\nAcked:     {len(ack_latencies)} in {acked:.2f} s ({len(ack_latencies) / acked:,.1f} req/s)")
+    print(f"Ack latency     p50 {percentile(ack_latencies, 50) * 1000:8.1f} ms   p99 {percentile(ack_latencies, 99) * 1000:8.1f} ms")
+    print(f"Replied:   {len(e2e)} in {finished:.2f} s ({len(e2e) / finished:,.1f} msg/s)")
+    print(f"End-to-end      p50 {percentile(e2e, 50) * 1000:8.1f} ms   p99 {percentile(e2e, 99) * 1000:8.1f} ms")
+    if retries:
+        print(f"Retried deliveries: {len(retries)}   replies sent: {sender.sends} for {len(e2e)} messages "
+              f"(duplicates skipped by MessageSid: {webhook_agent.dedup_store.duplicates})")
+    limits = agent_engine.gemini_limiter.stats()
+    print(f"Gemini limiter:  {limits['calls']} calls, {limits['queued']} queued, {limits['rejected']} rejected, "
+          f"wait p95 {limits['wait_p95'] * 1000:,.0f} ms")
+    busy = len(sent_at) - len(e2e)
+    if busy:
+        print(f"Not processed (queue full or timed out): {busy}")
+
+    server.should_exit = True
+    stub_db.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+import copy
+import threading
+import time
+from typing import Optional, TypedDict
+import supabase_client
+from supabase_client import SupabaseError
+
+# Shared data access for app.py, agent_engine.py, webhook_agent.py and the background jobs.
+# A Repository wraps a storage Backend with typed functions per table, an optional ReadCache,
+# write invalidation, RPC-with-fallback handling and per-call metrics. Backends:
+#   PostgrestBackend - the Supabase REST API over the pooled session in supabase_client
+#   MemoryBackend    - dict-backed tables understanding the PostgREST filters this app uses,
+#                      for tests and benchmarks (RPCs are "missing" unless registered)
+# Failures raise supabase_client.SupabaseError; each entry point decides how to surface them.
+
+class Expense(TypedDict, total=False):
+    id: str
+    date: str
+    item: str
+    category: str
+    amount: float
+    paid_by: str
+    notes: str
+    recurrence_frequency: Optional[str]
+    recurrence_next_due: Optional[str]
+    recurrence_active: int
+
+class Income(TypedDict, total=False):
+    id: str
+    date: str
+    source: str
+    amount: float
+    notes: str
+
+class CategoryBudget(TypedDict, total=False):
+    id: int
+    category: str
+    group_name: str
+    limit_amount: float
+    icon: str
+
+class Setting(TypedDict):
+    key: str
+    value: str
+
+class Backend:
+    """Storage interface. params/filters use PostgREST query syntax ({"date": "gte.2024-01-01"})."""
+    def select(self, table, params=None):
+        raise NotImplementedError
+
+    def insert(self, table, rows, resolution=None, return_rows=True):
+        """resolution: None (fail on conflict), "ignore-duplicates" or "merge-duplicates" """
+        raise NotImplementedError
+
+    def update(self, table, values, filters):
+        raise NotImplementedError
+
+    def delete(self, table, filters):
+        raise NotImplementedError
+
+    def rpc(self, function, args):
+        raise NotImplementedError
+
+class PostgrestBackend(Backend):
+    """Supabase PostgREST over supabase_client's pooled keep-alive session (retries included)"""
+    def __init__(self, url, api_key, timeout=supabase_client.DEFAULT_TIMEOUT):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def call(self, method, path, data=None, params=None, headers=None):
+        try:
+            response = supabase_client.rest_request(self.url, self.api_key, method, path, data=data, params=params,
+                                                    headers=headers, timeout=self.timeout)
+        except Exception as e:
+            raise SupabaseError(method, path, f"Supabase {method} error on {path}: {e}")
+        if response.status_code >= 400:
+            raise SupabaseError(method, path, f"Supabase {method} error on {path} (Status {response.status_code}): {response.text}", status=response.status_code)
+        return response.json() if response.text else []
+
+    def select(self, table, params=None):
+        return self.call("GET", table, params=params)
+
+    def insert(self, table, rows, resolution=None, return_rows=True):
+        prefer = [f"resolution={resolution}"] if resolution else []
+        prefer.append("return=representation" if return_rows else "return=minimal")
+        return self.call("POST", table, data=rows, headers={"Prefer": ",".join(prefer)})
+
+    def update(self, table, values, filters):
+        return self.call("PATCH", table, data=values, params=filters)
+
+    def delete(self, table, filters):
+        return self.call("DELETE", table, params=filters)
+
+    def rpc(self, function, args):
+        return self.call("POST", f"rpc/{function}", data=args)
+
+# In-memory backend
+
+PRIMARY_KEYS = {"settings": "key", "budget_month": "month", "processed_messages": "message_sid", "scheduler_leases": "name"}
+SERIAL_TABLES = {"category_budgets"}
+UNIQUE_COLUMNS = {"category_budgets": ("category",)}
+
+def split_top_level(text):
+    """Split 'a,and(b,c),d."x,y"' on commas outside parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+def parse_condition(column, expression):
+    op, _, value = expression.partition(".")
+    return ("filter", column, op, value)
+
+def parse_logic(kind, expression):
+    """'(date.lt.X,and(date.eq.X,id.lt."Y"))' -> ("or", [conditions])"""
+    conditions = []
+    for part in split_top_level(expression.strip()[1:-1]):
+        part = part.strip()
+        if part.startswith(("and(", "or(")):
+            nested_kind, _, rest = part.partition("(")
+            conditions.append(parse_logic(nested_kind, "(" + rest))
+        else:
+            column, _, rest = part.partition(".")
+            conditions.append(parse_condition(column, rest))
+    return (kind, conditions)
+
+def coerce(actual, value):
+    value = value.strip('"')
+    if isinstance(actual, bool):
+        return value.lower() in ("true", "1")
+    if isinstance(actual, (int, float)):
+        return float(value)
+    return value
+
+def matches(row, condition):
+    kind = condition[0]
+    if kind == "and":
+        return all(matches(row, c) for c in condition[1])
+    if kind == "or":
+        return any(matches(row, c) for c in condition[1])
+    _, column, op, value = condition
+    actual = row.get(column)
+    if op == "is":
+        return actual is None if value == "null" else actual == (value == "true")
+    if actual is None:
+        return False
+    if op == "in":
+        return any(actual == coerce(actual, v.strip()) for v in split_top_level(value.strip()[1:-1]))
+    expected = coerce(actual, value)
+    if op == "eq":
+        return actual == expected
+    if op == "neq":
+        return actual != expected
+    if op == "lt":
+        return actual < expected
+    if op == "lte":
+        return actual <= expected
+    if op == "gt":
+        return actual > expected
+    if op == "gte":
+        return actual >= expected
+    raise SupabaseError("GET", column, f"Unsupported filter operator {op!r} in memory backend", status=400)
+
+def parse_filters(params):
+    conditions = []
+    for name, value in (params or {}).items():
+        if name in ("select", "order", "limit", "offset", "on_conflict"):
+            continue
+        if name in ("or", "and"):
+            conditions.append(parse_logic(name, value))
+            continue
+        for expression in (value if isinstance(value, (list, tuple)) else [value]):
+            conditions.append(parse_condition(name, expression))
+    return conditions
+
+def sort_rows(rows, order):
+    for term in reversed([t for t in order.split(",") if t]):
+        column, _, direction = term.partition(".")
+        descending = direction.startswith("desc")
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=descending)
+        # PostgREST default: NULLS LAST ascending, NULLS FIRST descending
+        rows = missing + present if descending else present + missing
+    return rows
+
+class MemoryBackend(Backend):
+    """Thread-safe dict-of-lists tables for tests and benchmarks.
+
+    tables: {"expenses": [row, ...]}; rpcs: {"name": callable(backend, **args)}; latency: seconds
+    slept per call to mimic a network round trip.
+    """
+    def __init__(self, tables=None, rpcs=None, latency=0.0):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.rpcs = dict(rpcs or {})
+        self.latency = latency
+        self._lock = threading.RLock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def select(self, table, params=None):
+        self._wait()
+        params = params or {}
+        conditions = parse_filters(params)
+        with self._lock:
+            rows = [row for row in self._rows(table) if all(matches(row, c) for c in conditions)]
+            rows = copy.deepcopy(rows)
+        if params.get("order"):
+            rows = sort_rows(rows, params["order"])
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        elif offset:
+            rows = rows[offset:]
+        if params.get("select") and params["select"] != "*":
+            columns = [c.strip() for c in params["select"].split(",")]
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows
+
+    def insert(self, table, rows, resolution=None, return_rows=True):
+        self._wait()
+        rows = [dict(row) for row in (rows if isinstance(rows, list) else [rows])]
+        key = PRIMARY_KEYS.get(table, "id")
+        with self._lock:
+            # Apply to a copy so a failing row leaves the table untouched (one statement, one transaction)
+            existing = copy.deepcopy(self._rows(table))
+            written = []
+            for row in rows:
+                if key not in row and table in SERIAL_TABLES:
+                    row[key] = max((r[key] for r in existing), default=0) + 1
+                current = next((r for r in existing if r.get(key) == row.get(key)), None)
+                if current is not None:
+                    if resolution == "ignore-duplicates":
+                        continue
+                    if resolution != "merge-duplicates":
+                        raise SupabaseError("POST", table, f"duplicate key value violates unique constraint ({key}={row.get(key)})", status=409)
+                    current.update(row)
+                    written.append(dict(current))
+                    continue
+                for column in UNIQUE_COLUMNS.get(table, ()):
+                    if any(r.get(column) == row.get(column) for r in existing):
+                        raise SupabaseError("POST", table, f"duplicate key value violates unique constraint ({column}={row.get(column)})", status=409)
+                existing.append(row)
+                written.append(dict(row))
+            self.tables[table] = existing
+        return written if return_rows else []
+
+    def update(self, table, values, filters):
+        self._wait()
+        conditions = parse_filters(filters)
+        with self._lock:
+            updated = []
+            for row in self._rows(table):
+                if all(matches(row, c) for c in conditions):
+                    row.update(copy.deepcopy(values))
+                    updated.append(dict(row))
+        return updated
+
+    def delete(self, table, filters):
+        self._wait()
+        conditions = parse_filters(filters)
+        with self._lock:
+            rows = self._rows(table)
+            removed = [row for row in rows if all(matches(row, c) for c in conditions)]
+            self.tables[table] = [row for row in rows if not all(matches(row, c) for c in conditions)]
+        return removed
+
+    def rpc(self, function, args):
+        self._wait()
+        if function not in self.rpcs:
+            raise SupabaseError("POST", f"rpc/{function}", f"Could not find the function {function} (memory backend)", status=404)
+        with self._lock:
+            return self.rpcs[function](self, **args)
+
+class Repository:
+    """Typed data access over a Backend, with optional read caching and per-call metrics"""
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.missing_rpcs = set()  # RPCs the database does not expose (migration.sql not re-applied yet)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    # Instrumentation
+
+    def _timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._metrics_lock:
+                metric = self._metrics.setdefault(name, {"calls": 0, "errors": 0, "seconds": 0.0})
+                metric["calls"] += 1
+                metric["errors"] += failed
+                metric["seconds"] += elapsed
+
+    def stats(self):
+        """{"GET expenses": {"calls", "errors", "seconds"}, ...} plus read-cache hits/misses"""
+        with self._metrics_lock:
+            stats = {name: dict(metric) for name, metric in self._metrics.items()}
+        if self.cache is not None:
+            stats["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+        return stats
+
+    def invalidate(self, table=None):
+        """Drop cached reads of `table` and the aggregate RPC results derived from it (all when None)"""
+        if self.cache is not None:
+            self.cache.invalidate(table)
+            if table is not None:
+                self.cache.invalidate("rpc")
+
+    # Generic access (PostgREST query params)
+
+    def select(self, table, params=None, cached=True):
+        cache = self.cache if cached else None
+        if cache is not None:
+            hit, rows = cache.get(table, params)
+            if hit:
+                return rows
+            generation = cache.generation(table)
+        rows = self._timed(f"GET {table}", self.backend.select, table, params)
+        if cache is not None:
+            cache.set(table, params, rows, generation=generation)  # Errors raise above and are never cached
+        return rows
+
+    def insert(self, table, rows, resolution=None, return_rows=True):
+        try:
+            return self._timed(f"POST {table}", self.backend.insert, table, rows, resolution, return_rows)
+        finally:
+            # Even a failed write may have partially applied
+            self.invalidate(table)
+
+    def update(self, table, values, filters):
+        try:
+            return self._timed(f"PATCH {table}", self.backend.update, table, values, filters)
+        finally:
+            self.invalidate(table)
+
+    def delete(self, table, filters):
+        try:
+            return self._timed(f"DELETE {table}", self.backend.delete, table, filters)
+        finally:
+            self.invalidate(table)
+
+    def call_rpc(self, function, args, writes=()):
+        """Uncached RPC; raises SupabaseError (status 404 when the function is not deployed)"""
+        if function in self.missing_rpcs:
+            raise SupabaseError("POST", f"rpc/{function}", f"Function {function} is not available", status=404)
+        try:
+            return self._timed(f"RPC {function}", self.backend.rpc, function, args)
+        except SupabaseError as e:
+            if e.status == 404:
+                self.missing_rpcs.add(function)
+            raise
+        finally:
+            for table in writes:
+                self.invalidate(table)
+
+    def read_rpc(self, function, args):
+        """Cached read-only RPC. Returns None when it is unavailable so callers can fall back."""
+        if function in self.missing_rpcs:
+            return None
+        cache_params = {"function": function, **args}
+        if self.cache is not None:
+            hit, rows = self.cache.get("rpc", cache_params)
+            if hit:
+                return rows
+            generation = self.cache.generation("rpc")
+        try:
+            rows = self.call_rpc(function, args)
+        except SupabaseError:
+            return None
+        if self.cache is not None:
+            self.cache.set("rpc", cache_params, rows, generation=generation)
+        return rows
+
+    # Expenses
+
+    def expenses_between(self, start: str, end: str) -> list[Expense]:
+        return self.select("expenses", {"date": [f"gte.{start}", f"lte.{end}"], "order": "date.desc"})
+
+    def expenses_since(self, since: str, limit: int) -> list[Expense]:
+        return self.select("expenses", {"date": f"gte.{since}", "order": "date.desc", "limit": str(limit)})
+
+    def due_recurring_expenses(self, until: str) -> list[Expense]:
+        return self.select("expenses", {"recurrence_active": "eq.1", "recurrence_next_due": f"lte.{until}"}, cached=False)
+
+    def add_expenses(self, rows: list[Expense], ignore_duplicates: bool = False, return_rows: bool = True) -> list[Expense]:
+        return self.insert("expenses", rows, "ignore-duplicates" if ignore_duplicates else None, return_rows)
+
+    def advance_recurrence(self, expense_id: str, due: str, next_due: str) -> list[Expense]:
+        """Move a recurring expense's next due date, only if it is still `due` (no other column is written)"""
+        return self.update("expenses", {"recurrence_next_due": next_due}, {"id": f"eq.{expense_id}", "recurrence_next_due": f"eq.{due}"})
+
+    def advance_recurrences(self, advances: list[dict]) -> int:
+        """advance_recurrence for many parents ({"id", "due", "next_due"}) in one round trip; returns how many moved.
+
+        Falls back to one guarded PATCH per parent when the advance_recurrences RPC is not installed.
+        """
+        rows = [{"id": a["id"], "due": a["due"], "next_due": a["next_due"]} for a in advances]
+        try:
+            return self.call_rpc("advance_recurrences", {"p_rows": rows}, writes=("expenses",))
+        except SupabaseError as e:
+            if e.status != 404:
+                raise
+        return sum(len(self.advance_recurrence(r["id"], r["due"], r["next_due"])) for r in rows)
+
+    def update_expense(self, expense_id: str, values: dict) -> list[Expense]:
+        return self.update("expenses", values, {"id": f"eq.{expense_id}"})
+
+    def delete_expense(self, expense_id: str) -> list[Expense]:
+        return self.delete("expenses", {"id": f"eq.{expense_id}"})
+
+    def delete_all_expenses(self) -> list[Expense]:
+        return self.delete("expenses", {})
+
+    # Income
+
+    def income_between(self, start: str, end: str) -> list[Income]:
+        return self.select("income", {"date": [f"gte.{start}", f"lte.{end}"], "order": "date.desc"})
+
+    def add_income(self, rows: list[Income], ignore_duplicates: bool = False) -> list[Income]:
+        return self.insert("income", rows, "ignore-duplicates" if ignore_duplicates else None)
+
+    def update_income(self, income_id: str, values: dict) -> list[Income]:
+        return self.update("income", values, {"id": f"eq.{income_id}"})
+
+    def delete_income(self, income_id: str) -> list[Income]:
+        return self.delete("income", {"id": f"eq.{income_id}"})
+
+    def delete_all_income(self) -> list[Income]:
+        return self.delete("income", {})
+
+    # History (expenses or income)
+
+    def history_page(self, table: str, cursor: Optional[tuple] = None, before_date: Optional[str] = None,
+                     page_size: int = 50) -> tuple[list[dict], bool]:
+        """One newest-first page using keyset pagination on (date, id).
+
+        cursor is the (date, id) of the last row already shown; before_date starts the listing at
+        that day. Pages are cached until the table is written. Returns (rows, has_more).
+        """
+        params = {"order": "date.desc,id.desc", "limit": str(page_size + 1)}
+        if cursor:
+            cursor_date, cursor_id = cursor
+            params["or"] = f'(date.lt.{cursor_date},and(date.eq.{cursor_date},id.lt."{cursor_id}"))'
+        if before_date:
+            params["date"] = f"lte.{before_date}"
+        rows = self.select(table, params)
+        return rows[:page_size], len(rows) > page_size
+
+    # Category budgets
+
+    def list_budgets(self, columns: Optional[str] = None) -> list[CategoryBudget]:
+        params = {"order": "group_name,category"}
+        if columns:
+            params["select"] = columns
+        return self.select("category_budgets", params)
+
+    def has_budgets(self) -> bool:
+        return bool(self.select("category_budgets", {"limit": "1"}))
+
+    def add_budgets(self, rows: list[CategoryBudget]) -> list[CategoryBudget]:
+        return self.insert("category_budgets", rows)
+
+    def save_budgets(self, upserts: list[CategoryBudget], delete_ids: list[int]) -> None:
+        """Apply a budget diff atomically via the save_category_budgets RPC (one round trip).
+
+        Falls back to one upsert plus one filtered delete when the RPC is not installed.
+        """
+        try:
+            self.call_rpc("save_category_budgets", {"p_rows": upserts, "p_delete_ids": delete_ids}, writes=("category_budgets",))
+            return
+        except SupabaseError as e:
+            if e.status != 404:
+                raise
+        if upserts:
+            self.insert("category_budgets", upserts, "merge-duplicates")
+        if delete_ids:
+            self.delete("category_budgets", {"id": f"in.({','.join(str(i) for i in delete_ids)})"})
+
+    # Settings
+
+    def get_setting(self, key: str) -> Optional[str]:
+        rows = self.select("settings", {"key": f"eq.{key}"})
+        return rows[0]['value'] if rows else None
+
+    def set_setting(self, key: str, value: str) -> None:
+        self.insert("settings", {"key": key, "value": value}, "merge-duplicates")
+
+    # Agent writes
+
+    def log_transactions(self, expenses: list[Expense], income: list[Income]) -> int:
+        """Insert one message's rows in a single round trip; returns the number inserted.
+
+        rpc/log_transactions writes both tables in one transaction. Until it is deployed, each table
+        gets one bulk insert, and the expenses just inserted are deleted again if the income insert
+        fails. Ids that already exist are skipped either way.
+        """
+        try:
+            return self.call_rpc("log_transactions", {"p_expenses": expenses, "p_income": income}, writes=("expenses", "income"))
+        except SupabaseError as e:
+            if e.status != 404:
+                raise
+        saved = self.insert("expenses", expenses, "ignore-duplicates") if expenses else []
+        try:
+            saved_income = self.insert("income", income, "ignore-duplicates") if income else []
+        except SupabaseError as e:
+            if saved:
+                try:
+                    self.delete("expenses", {"id": "in.(" + ",".join(f'"{row["id"]}"' for row in saved) + ")"})
+                except SupabaseError:
+                    raise SupabaseError(e.method, e.table, f"{len(saved)} expense(s) saved before income failed: {e}", status=e.status)
+            raise
+        return len(saved) + len(saved_income)
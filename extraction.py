@@ -0,0 +1,147 @@
+import json
+import re
+from datetime import datetime
+import fast_parser
+
+# Structured (JSON) transaction extraction shared by the agent's single-round-trip mode and the
+# batch importer. The model is asked for JSON matching RESPONSE_SCHEMA. The engine validates it
+# and runs the writes itself, and the reply is built from templates instead of a second model call.
+
+VALID_PAYERS = ("Hadi", "Ruhi")
+FALLBACK_CATEGORY = "Other"
+NO_TRANSACTIONS_REPLY = "I couldn't find an expense or income in that message. Try something like 'Spent 500 on dinner'."
+
+PROMPT = """
+You are a helpful Family Budget Assistant. Extract the financial transactions from each numbered message.
+
+Current Categories available: {categories}
+
+Rules:
+1. Spending money is an "expense" with item, amount, category and paid_by.
+2. Pick the most relevant category from the list, exactly as written. If none fits, use "{fallback}".
+3. Receiving money is an "income" with source and amount.
+4. Default paid_by to "Hadi" unless "Ruhi" is mentioned.
+5. A message may contain several transactions or none at all.
+6. Only set "date" (YYYY-MM-DD) when the message names a specific day.
+
+Reply with JSON only, one entry per message, in this shape:
+{{"results": [{{"message": 1, "transactions": [
+  {{"type": "expense", "item": "...", "amount": 0, "category": "...", "paid_by": "Hadi", "notes": "", "date": null}},
+  {{"type": "income", "source": "...", "amount": 0, "notes": "", "date": null}}
+]}}]}}
+
+Messages:
+{messages}
+"""
+
+# Gemini response_schema (OpenAPI subset) for the shape above
+TRANSACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "description": "expense or income"},
+        "item": {"type": "string"},
+        "source": {"type": "string"},
+        "amount": {"type": "number"},
+        "category": {"type": "string"},
+        "paid_by": {"type": "string", "description": "Hadi or Ruhi"},
+        "notes": {"type": "string"},
+        "date": {"type": "string", "nullable": True, "description": "YYYY-MM-DD"},
+    },
+    "required": ["type", "amount"],
+}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "message": {"type": "integer"},
+                    "transactions": {"type": "array", "items": TRANSACTION_SCHEMA},
+                },
+                "required": ["message", "transactions"],
+            },
+        },
+    },
+    "required": ["results"],
+}
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+# Parameters of the agent's log_transactions tool
+TRANSACTIONS_PARAMETERS = {
+    "type": "object",
+    "properties": {"transactions": {"type": "array", "items": TRANSACTION_SCHEMA}},
+    "required": ["transactions"],
+}
+
+def build_prompt(texts, categories):
+    numbered = "\n".join(f"{i}. {json.dumps(text, ensure_ascii=False)}" for i, text in enumerate(texts, 1))
+    return PROMPT.format(categories=", ".join(categories), fallback=FALLBACK_CATEGORY, messages=numbered)
+
+def parse_response(text, count):
+    """Model reply -> {message number: [transaction, ...]}. Raises ValueError on malformed output."""
+    # Tolerate a ```json fence even in JSON mode
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    payload = json.loads(text)
+    results = payload.get("results") if isinstance(payload, dict) else payload
+    if not isinstance(results, list):
+        raise ValueError("expected a 'results' list")
+    extracted = {}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        number = result.get("message")
+        if isinstance(number, int) and 1 <= number <= count:
+            transactions = result.get("transactions") or []
+            extracted[number] = transactions if isinstance(transactions, list) else []
+    return extracted
+
+def validate_transaction(transaction, categories):
+    """Return (tool, kwargs, date) for a well-formed transaction; raises ValueError otherwise.
+
+    kwargs match agent_engine.log_expense / log_income; date is YYYY-MM-DD or None.
+    """
+    if not isinstance(transaction, dict):
+        raise ValueError("transaction is not an object")
+    try:
+        amount = float(transaction.get("amount"))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid amount {transaction.get('amount')!r}")
+    if amount <= 0:
+        raise ValueError(f"amount must be positive, got {amount:g}")
+
+    date = transaction.get("date") or None
+    if date:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid date {date!r}")
+    notes = str(transaction.get("notes") or "")
+
+    kind = transaction.get("type")
+    if kind == "income":
+        source = str(transaction.get("source") or "").strip()
+        if not source:
+            raise ValueError("income without a source")
+        return "log_income", {"source": source, "amount": amount, "notes": notes}, date
+    if kind != "expense":
+        raise ValueError(f"unknown transaction type {kind!r}")
+
+    item = str(transaction.get("item") or "").strip()
+    if not item:
+        raise ValueError("expense without an item")
+    by_name = {c.lower(): c for c in categories}
+    category = by_name.get(str(transaction.get("category") or "").strip().lower())
+    if category is None:
+        category = by_name.get(FALLBACK_CATEGORY.lower())
+        if category is None:
+            raise ValueError(f"unknown category {transaction.get('category')!r}")
+    paid_by = str(transaction.get("paid_by") or "Hadi").strip().title()
+    if paid_by not in VALID_PAYERS:
+        raise ValueError(f"unknown payer {transaction.get('paid_by')!r}")
+    return "log_expense", {"item": item, "amount": amount, "category": category, "paid_by": paid_by, "notes": notes}, date
+
+def confirmation(tool, kwargs):
+    """Template reply for one logged transaction (same wording as the fast path)"""
+    return fast_parser.confirmation({"tool": tool, "args": kwargs})
@@ -0,0 +1,192 @@
+import re
+from difflib import SequenceMatcher
+
+# Deterministic fast path for the WhatsApp agent.
+# Short messages such as "groceries 1200" or "rent 15000 paid by Ruhi" are parsed with rules
+# (amount regex, fuzzy category match, payer detection, Bangla numerals) and logged directly.
+# Anything ambiguous returns None and goes to the LLM as before.
+
+BANGLA_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+PAYERS = {"hadi": "Hadi", "ruhi": "Ruhi", "হাদি": "Hadi", "রুহি": "Ruhi"}
+DEFAULT_PAYER = "Hadi"
+
+# 1,200 / 1,20,000 / 1200 / 1200.50 / 1.5k, optionally with ৳, tk, taka, bdt or /- around it
+AMOUNT_RE = re.compile(
+    r"(?:৳|\btk\.?|\btaka\b|\bbdt\b|টাকা)?\s*"
+    r"(?<![\w.])(\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)(k\b)?"
+    r"\s*(?:৳|tk\b\.?|taka\b|bdt\b|/-|টাকা)?",
+    re.IGNORECASE
+)
+# Any standalone payer name, with "paid by" / "by" before it or "paid" after it
+PAYER_RE = re.compile(r"(?:\b(?:paid\s+by|by)\s+)?(?<!\w)(hadi|ruhi|হাদি|রুহি)(?!\w)(?:\s+paid\b)?", re.IGNORECASE)
+# "from Ruhi" / "to Ruhi" may name the other party (money received, a transfer) rather than the payer
+COUNTERPARTY_RE = re.compile(r"\b(?:from|to)\s+(?<!\w)(?:hadi|ruhi|হাদি|রুহি)(?!\w)", re.IGNORECASE)
+INCOME_RE = re.compile(r"\b(salary|income|received|receive|bonus|refund)\b|বেতন", re.IGNORECASE)
+# Income wording left out of the logged source
+INCOME_ONLY_WORDS = {"received", "receive", "income"}
+# Negations, corrections and questions: never log these without the model
+INTENT_RE = re.compile(
+    r"\b(?:don'?t|do\s+not|didn'?t|won'?t|not|no|never|undo|cancel|delete|remove|wrong|mistake|instead)\b|\?",
+    re.IGNORECASE
+)
+# Words that signal the message is more than a single plain transaction
+COMPLEX_RE = re.compile(r"\b(and|also|each|per|every|split|owe|lent|borrow|yesterday|tomorrow|last|next)\b|[,;+&]\s*\D", re.IGNORECASE)
+
+STOP_WORDS = {"for", "on", "the", "a", "an", "of", "spent", "spend", "paid", "pay", "bought", "buy", "bill", "to", "in", "at", "my"}
+
+# Common words that name a category without sharing a token with it. Only used when that
+# category exists in the current budget. Transport words resolve per payer.
+CATEGORY_ALIASES = {
+    "grocery": "Groceries & Food", "groceries": "Groceries & Food", "bazar": "Groceries & Food",
+    "bazaar": "Groceries & Food", "বাজার": "Groceries & Food", "food": "Groceries & Food",
+    "vegetables": "Groceries & Food", "fish": "Groceries & Food", "rice": "Groceries & Food",
+    "rent": "Monthly Rent", "ভাড়া": "Monthly Rent",
+    "electricity": "Electricity / Gas / Water", "gas": "Electricity / Gas / Water",
+    "water": "Electricity / Gas / Water", "current": "Electricity / Gas / Water",
+    "internet": "Internet / Phone / Subscriptions", "wifi": "Internet / Phone / Subscriptions",
+    "recharge": "Internet / Phone / Subscriptions", "netflix": "Internet / Phone / Subscriptions",
+    "maid": "Household Help (Maid/Cook)", "cook": "Household Help (Maid/Cook)",
+    "diaper": "Yusra (Diapers, Wipes, Baby Care)", "diapers": "Yusra (Diapers, Wipes, Baby Care)",
+    "wipes": "Yusra (Diapers, Wipes, Baby Care)",
+    "driver": "Car Maintenance / Driver", "fuel": "Car Maintenance / Driver", "petrol": "Car Maintenance / Driver",
+    "hangout": "Family Hangout", "restaurant": "Family Hangout",
+    "service": "Service Charge / Maintenance",
+}
+COMMUTE_WORDS = {"rickshaw", "uber", "pathao", "cng", "bus", "commute", "taxi", "metro"}
+# Words that may sit next to an alias without changing what the message means
+FILLER_WORDS = {"monthly", "today", "cash", "bkash", "nagad", "card", "this", "month", "week", "some"}
+FILLER_SCORE = 0.75
+
+MATCH_THRESHOLD = 0.84
+AMBIGUITY_MARGIN = 0.05
+MIN_CONFIDENCE = 0.85
+MAX_ITEM_WORDS = 4
+
+def normalize_digits(text):
+    return text.translate(BANGLA_DIGITS)
+
+def parse_amount(token, thousands_suffix):
+    amount = float(token.replace(",", ""))
+    return amount * 1000 if thousands_suffix else amount
+
+def tokenize(text):
+    # Split on whitespace/punctuation rather than \w: Bangla vowel signs are not word characters
+    words = re.split(r"[\s,;:!?.()/&'\"\-]+", text.lower())
+    return [w for w in words if w and not any(c.isdigit() for c in w) and w not in STOP_WORDS]
+
+def similarity(word, name_word):
+    if min(len(word), len(name_word)) >= 4 and (name_word.startswith(word) or word.startswith(name_word)):
+        return 1.0
+    return SequenceMatcher(None, word, name_word).ratio()
+
+def fuzzy_category(words, categories):
+    """Category whose name best covers the message words as (category, score), or (None, score)"""
+    scores = []
+    for category in categories:
+        name_words = [w for w in tokenize(category) if len(w) > 1]
+        if not name_words:
+            continue
+        # Every message word has to find a counterpart in the name, so average the best matches
+        score = sum(max(similarity(word, name_word) for name_word in name_words) for word in words) / len(words)
+        scores.append((score, category))
+    if not scores:
+        return None, 0.0
+    scores.sort(reverse=True)
+    best_score, best = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0.0
+    if best_score < MATCH_THRESHOLD or best_score - runner_up < AMBIGUITY_MARGIN:
+        return None, best_score
+    return best, best_score
+
+def match_category(words, categories, paid_by):
+    """Best category for the message words as (category, score), or (None, score) if unsure.
+
+    Every word has to be accounted for: by the fuzzy name match, or word by word as an alias,
+    commute word or name word of one single category, or a filler word. The score is the mean
+    per-word match (aliases 1.0, fillers FILLER_SCORE), so mostly-filler messages fall below
+    MIN_CONFIDENCE.
+    """
+    category, score = fuzzy_category(words, categories)
+    if category:
+        return category, score
+
+    available = set(categories)
+    found, total = set(), 0.0
+    for word in words:
+        target = f"Office Commute ({paid_by})" if word in COMMUTE_WORDS else CATEGORY_ALIASES.get(word)
+        if target in available:
+            found.add(target)
+            total += 1.0
+            continue
+        # A word of a category's own name ("phone" in "phone recharge")
+        named, word_score = fuzzy_category([word], categories)
+        if named:
+            found.add(named)
+            total += word_score
+        elif word in FILLER_WORDS:
+            total += FILLER_SCORE
+        else:
+            return None, score
+    if len(found) != 1:
+        return None, score
+    return found.pop(), total / len(words)
+
+def parse(text, categories):
+    """Parse a plain one-transaction message.
+
+    categories: category names from category_budgets. Returns
+    {"tool": "log_expense" | "log_income", "args": {...}, "confidence": float} when the message is
+    unambiguous, otherwise None so the caller falls back to the LLM.
+    """
+    normalized = normalize_digits(text).strip()
+    if not normalized or COMPLEX_RE.search(normalized) or INTENT_RE.search(normalized) or COUNTERPARTY_RE.search(normalized):
+        return None
+
+    amounts = list(AMOUNT_RE.finditer(normalized))
+    if len(amounts) != 1:
+        return None
+    amount = parse_amount(amounts[0].group(1), amounts[0].group(2))
+    if amount <= 0:
+        return None
+    remainder = normalized[:amounts[0].start()] + " " + normalized[amounts[0].end():]
+
+    payers = {PAYERS[m.group(1).lower()] for m in PAYER_RE.finditer(remainder)}
+    if len(payers) > 1:
+        return None
+    paid_by = payers.pop() if payers else DEFAULT_PAYER
+    remainder = PAYER_RE.sub(" ", remainder)
+
+    words = tokenize(remainder)
+    if not words or len(words) > MAX_ITEM_WORDS:
+        return None
+    item = " ".join(w for w in re.sub(r"\s+", " ", remainder).strip(" -:.").split())
+
+    if INCOME_RE.search(remainder):
+        item_words = [w for w in words if not INCOME_RE.fullmatch(w)]
+        # Income wording next to a category ("refund groceries 300", "driver salary 12000") could be
+        # money in or out: the model decides
+        names_category = any(w in CATEGORY_ALIASES or w in COMMUTE_WORDS for w in item_words)
+        if names_category or (item_words and match_category(item_words, categories, paid_by)[0]):
+            return None
+        # Income keywords score 1.0; free-text source words ("freelance") count like fillers
+        score = (len(words) - len(item_words) + FILLER_SCORE * len(item_words)) / len(words)
+        if score < MIN_CONFIDENCE:
+            return None
+        source_words = [w for w in words if w not in INCOME_ONLY_WORDS]
+        source = " ".join(source_words).title() or "Income"
+        return {"tool": "log_income", "args": {"source": source, "amount": amount, "notes": ""}, "confidence": score}
+    category, score = match_category(words, categories, paid_by)
+    if not category or score < MIN_CONFIDENCE:
+        return None
+    return {
+        "tool": "log_expense",
+        "args": {"item": item, "amount": amount, "category": category, "paid_by": paid_by, "notes": ""},
+        "confidence": score,
+    }
+
+def confirmation(parsed):
+    """Reply text for a transaction logged through the fast path"""
+    args = parsed["args"]
+    if parsed["tool"] == "log_income":
+        return f"💰 Logged income: ৳{args['amount']:,.0f} from {args['source']}"
+    return f"✅ Logged expense: ৳{args['amount']:,.0f} for {args['item']} ({args['category']}), paid by {args['paid_by']}"
@@ -0,0 +1,38 @@
+# History list state kept in st.session_state across reruns (see app.load_history).
+# Rows come from keyset pages ordered newest first by (date, id); the last kept row is the cursor
+# for Load more, so optimistic edits must never keep a row past rows not fetched yet.
+
+def new_history_state(start=None):
+    """History position for a table: starting day (None = newest), pages requested, and the rows
+    kept from the pages fetched so far"""
+    return {"start": start, "pages": 1, "loaded": 0, "rows": [], "has_more": False, "loaded_at": 0.0}
+
+def history_key(row):
+    return (row['date'], row['id'])
+
+def keep_in_history(state, row, boundary=None):
+    """Insert a saved row into the kept History rows if it falls inside the range they cover.
+
+    A row older than the last kept one (boundary) is left out while more pages exist: Load more
+    will bring it, and keeping it would move the page cursor past rows not fetched yet. With more
+    pages and no rows kept (all deleted) nothing is kept: Load more starts again from the newest.
+    """
+    rows = state["rows"]
+    boundary = boundary or (history_key(rows[-1]) if rows else None)
+    if state["start"] and row['date'] > state["start"]:
+        return
+    if state["has_more"] and (not boundary or history_key(row) < boundary):
+        return
+    rows.append(row)
+    rows.sort(key=history_key, reverse=True)
+
+def patch_kept_row(state, row_id, values=None):
+    """Apply a saved edit (values) or a delete (values=None) to a kept row; rows not kept are ignored"""
+    rows = state["rows"]
+    old = next((row for row in rows if row['id'] == row_id), None)
+    if old is None:
+        return
+    boundary = history_key(rows[-1])
+    rows.remove(old)
+    if values is not None:
+        keep_in_history(state, {**old, **values}, boundary)
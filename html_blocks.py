@@ -0,0 +1,107 @@
+from html import escape
+
+# HTML for the dashboard's category breakdown and the History lists, each built as one block.
+# Every st.markdown call is its own delta over the websocket (and its own reflow in the browser),
+# so a section is rendered with a single call instead of one call per row.
+# Templates are unindented and contain no blank lines: Markdown would otherwise end the HTML block
+# or turn indented lines into code.
+
+BUDGET_ROW = """<div style="background: white; border-bottom: 1px solid #E5E5EA; padding: 12px 4px; margin-bottom: 0;">
+<div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;">
+<div style="display: flex; align-items: center; gap: 10px;">
+<span style="font-size: 1.2rem; width: 24px; text-align: center;">{icon}</span>
+<span style="font-weight: 600; color: var(--ios-text); font-size: 16px;">{category}</span>
+</div>
+<div style="background: {bg_color}; color: {text_color}; padding: 2px 8px; border-radius: 6px; font-size: 13px; font-weight: 600;">{percentage:.0f}%</div>
+</div>
+<div style="width: 100%; height: 10px; background: #E5E5EA; border-radius: 99px; overflow: hidden; margin-bottom: 6px;">
+<div style="width: {width}%; height: 100%; background: {bar_background}; border-radius: 99px;"></div>
+</div>
+<div style="display: flex; justify-content: flex-end; align-items: baseline; gap: 4px;">
+<span style="font-weight: 600; color: var(--ios-text); font-size: 15px;">৳{spent:,.0f}</span>
+<span style="color: var(--ios-text-secondary); font-size: 13px;">/ ৳{limit:,.0f}</span>
+</div>
+</div>"""
+
+# Collapsible group, styled like st.expander
+BUDGET_GROUP = """<details open style="border: 1px solid #E5E5EA; border-radius: 12px; padding: 4px 14px; margin-bottom: 12px; background: white;">
+<summary style="cursor: pointer; padding: 10px 0; font-weight: 600; color: var(--ios-text);">📁 {group}</summary>
+{rows}
+</details>"""
+
+EXPENSE_ROW = """<div style="background: white; border-bottom: 0.5px solid #C6C6C8; padding: 12px 0;">
+<div style="display: flex; justify-content: space-between; align-items: center;">
+<div style="display: flex; align-items: center; gap: 12px;">
+<div style="font-size: 24px; min-width: 30px; text-align: center;">{icon}</div>
+<div>
+<div style="font-weight: 600; font-size: 16px; color: var(--ios-text);">{item}</div>
+<div style="font-size: 13px; color: var(--ios-text-secondary);">{category} • {paid_by}{recurrence}</div>
+</div>
+</div>
+<div style="text-align: right;">
+<div style="font-weight: 600; font-size: 16px; color: var(--ios-text);">-৳{amount:,.0f}</div>
+<div style="font-size: 13px; color: var(--ios-text-secondary);">{date}</div>
+</div>
+</div>{notes}
+</div>"""
+
+INCOME_ROW = """<div style="background: white; border-bottom: 0.5px solid #C6C6C8; padding: 12px 0;">
+<div style="display: flex; justify-content: space-between; align-items: center;">
+<div style="display: flex; align-items: center; gap: 12px;">
+<div style="font-size: 24px; min-width: 30px; text-align: center;">💰</div>
+<div>
+<div style="font-weight: 600; font-size: 16px; color: var(--ios-text);">{source}</div>
+<div style="font-size: 13px; color: var(--ios-text-secondary);">{date}</div>
+</div>
+</div>
+<div style="text-align: right;">
+<div style="font-weight: 600; font-size: 16px; color: #34C759;">+৳{amount:,.0f}</div>
+</div>
+</div>{notes}
+</div>"""
+
+NOTES = '<div style="font-size: 13px; color: var(--ios-text-secondary); margin-top: 4px; margin-left: 42px;">{notes}</div>'
+
+def progress_colors(percentage):
+    """(bar gradient, badge background, badge text color) for a budget's % of limit"""
+    if percentage >= 100:
+        return "linear-gradient(90deg, #FF9500 0%, #FF3B30 100%)", "#FFEBEA", "#FF3B30"
+    if percentage >= 85:
+        return "linear-gradient(90deg, #FFCC00 0%, #FF9500 100%)", "#FFF3D6", "#FF9500"
+    return "linear-gradient(90deg, #34C759 0%, #30B0C7 100%)", "#E4F9E9", "#34C759"
+
+def budget_row(budget):
+    bar_background, bg_color, text_color = progress_colors(budget.percentage)
+    return BUDGET_ROW.format(
+        icon=escape(str(budget.icon)), category=escape(str(budget.category)),
+        bg_color=bg_color, text_color=text_color, bar_background=bar_background,
+        percentage=budget.percentage, width=budget.width, spent=budget.spent, limit=budget.limit_amount,
+    )
+
+def budget_breakdown(progress):
+    """Category breakdown for analytics.budget_progress rows, one collapsible section per group"""
+    return "\n".join(
+        BUDGET_GROUP.format(group=escape(str(group)), rows="\n".join(budget_row(b) for b in budgets.itertuples(index=False)))
+        for group, budgets in progress.groupby("group_name", sort=False, dropna=False)
+    )
+
+def notes_html(row):
+    # Line breaks become <br> so a blank line in a note can't end the HTML block
+    return NOTES.format(notes=escape(str(row["notes"])).replace("\n", "<br>")) if row.get("notes") else ""
+
+def expense_list(expenses, category_icons):
+    return "\n".join(
+        EXPENSE_ROW.format(
+            icon=escape(str(category_icons.get(e["category"], "📦"))),
+            item=escape(str(e["item"])), category=escape(str(e["category"])), paid_by=escape(str(e["paid_by"])),
+            recurrence=" • 🔄" if e.get("recurrence_active") else "",
+            amount=e["amount"], date=e["date"], notes=notes_html(e),
+        )
+        for e in expenses
+    )
+
+def income_list(income):
+    return "\n".join(
+        INCOME_ROW.format(source=escape(str(i["source"])), amount=i["amount"], date=i["date"], notes=notes_html(i))
+        for i in income
+    )
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from supabase_client import SupabaseError
+
+# Webhook de-duplication keyed on Twilio's MessageSid.
+# Twilio retries a webhook it thinks timed out; without this a retry runs the agent again and
+# logs the same expense twice. claim() is checked before a message is queued: an in-process LRU
+# answers repeats seen by this worker, and the processed_messages table (see migration.sql)
+# answers repeats that land on another process. Until that table exists only the LRU is used.
+# Twilio only retries within minutes, so rows older than RETENTION_DAYS are pruned
+# (periodically, by webhook_agent's prune_worker).
+
+TABLE = "processed_messages"
+MAX_ENTRIES = 10000
+RETENTION_DAYS = 7
+
+class IdempotencyStore:
+    def __init__(self, repository=None, max_entries=MAX_ENTRIES):
+        self.repository = repository
+        self.max_entries = max_entries
+        self.use_table = repository is not None
+        self._entries = OrderedDict()  # message_sid -> agent reply (None while processing)
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def _remember(self, message_sid, reply=None):
+        self._entries[message_sid] = reply
+        self._entries.move_to_end(message_sid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _claim_row(self, message_sid):
+        """True if this process inserted the row, False if it already existed, None if unknown"""
+        try:
+            return bool(self.repository.insert(TABLE, [{"message_sid": message_sid}], "ignore-duplicates"))
+        except SupabaseError as e:
+            if e.status == 404:
+                print(f"Warning: {TABLE} table not found; de-duplicating within this process only")
+                self.use_table = False
+            else:
+                print(f"Idempotency claim for {message_sid} failed: {e}")
+            return None
+
+    def claim(self, message_sid):
+        """True the first time a MessageSid is seen, False for repeats.
+
+        Fails open: if the table can't be reached the message is processed rather than dropped.
+        """
+        with self._lock:
+            if message_sid in self._entries:
+                self._entries.move_to_end(message_sid)
+                self.duplicates += 1
+                return False
+            self._remember(message_sid)
+        if self.use_table and self._claim_row(message_sid) is False:
+            with self._lock:
+                self.duplicates += 1
+            return False
+        return True
+
+    def release(self, message_sid):
+        """Forget a claim whose message was not processed (e.g. the queue was full) so a retry can run"""
+        with self._lock:
+            self._entries.pop(message_sid, None)
+        if self.use_table:
+            try:
+                self.repository.delete(TABLE, {"message_sid": f"eq.{message_sid}"})
+            except SupabaseError as e:
+                print(f"Idempotency release for {message_sid} failed: {e}")
+
+    def record_reply(self, message_sid, reply):
+        """Store the agent's reply next to the claim (for logs and support)"""
+        with self._lock:
+            self._remember(message_sid, reply)
+        if self.use_table:
+            try:
+                self.repository.update(TABLE, {"reply": reply}, {"message_sid": f"eq.{message_sid}"})
+            except SupabaseError as e:
+                print(f"Idempotency reply for {message_sid} not saved: {e}")
+
+    def reply_for(self, message_sid):
+        with self._lock:
+            return self._entries.get(message_sid)
+
+    def prune(self, max_age_days=RETENTION_DAYS):
+        """Delete table rows older than max_age_days; returns how many were removed"""
+        if not self.use_table:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        try:
+            return len(self.repository.delete(TABLE, {"created_at": f"lt.{cutoff.isoformat()}"}))
+        except SupabaseError as e:
+            if e.status != 404:
+                print(f"Pruning {TABLE} failed: {e}")
+            return 0
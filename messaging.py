@@ -0,0 +1,54 @@
+import os
+import supabase_client
+
+# Outbound messaging for the WhatsApp webhook.
+# The webhook acknowledges Twilio immediately and sends the agent's reply later through a
+# MessageSender, so the transport is pluggable: Twilio's REST API in production, the console
+# locally, or a recording stub in load tests.
+
+TWILIO_API_URL = "https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+
+class MessageSender:
+    """Interface: deliver `body` to `to` (e.g. 'whatsapp:+8801XXXXXXXXX'), optionally from a specific number"""
+    def send(self, to, body, from_=None):
+        raise NotImplementedError
+
+class TwilioSender(MessageSender):
+    """Sends replies through the Twilio Messages REST API"""
+    def __init__(self, account_sid, auth_token, from_number=None, timeout=10):
+        self.url = TWILIO_API_URL.format(account_sid=account_sid)
+        self.auth = (account_sid, auth_token)
+        self.from_number = from_number
+        self.timeout = timeout
+
+    def send(self, to, body, from_=None):
+        sender = self.from_number or from_
+        if not sender:
+            raise ValueError("No WhatsApp sender number configured for Twilio replies")
+        # Reuse the pooled keep-alive session instead of opening a connection per reply
+        response = supabase_client.get_session().post(
+            self.url,
+            data={"To": to, "From": sender, "Body": body},
+            auth=self.auth,
+            timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"Twilio send failed (Status {response.status_code}): {response.text}")
+        return response.json()
+
+class ConsoleSender(MessageSender):
+    """Prints replies instead of sending them (local development)"""
+    def send(self, to, body, from_=None):
+        print(f"Reply to {to}: {body}")
+
+def default_sender(secrets=None):
+    """TwilioSender when [twilio] credentials are configured, otherwise ConsoleSender"""
+    secrets = supabase_client.load_secrets() if secrets is None else secrets
+    twilio = secrets.get("twilio", {})
+    account_sid = twilio.get("account_sid") or os.environ.get("TWILIO_ACCOUNT_SID")
+    auth_token = twilio.get("auth_token") or os.environ.get("TWILIO_AUTH_TOKEN")
+    from_number = twilio.get("from_number") or os.environ.get("TWILIO_WHATSAPP_FROM")
+    if account_sid and auth_token:
+        return TwilioSender(account_sid, auth_token, from_number)
+    print("Warning: Twilio credentials not found; replies will be printed to the console")
+    return ConsoleSender()
@@ -65,3 +65,332 @@ VALUES
     ('Family Hangout', 'LIVING', 4000, '🎉'),
     ('Other', 'OTHERS', 2000, '📦')
 ON CONFLICT (category) DO NOTHING;
+
+-- Indexes for date-range, category and recurrence filters
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date DESC);
+CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses (category, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_recurrence ON expenses (recurrence_active, recurrence_next_due);
+CREATE INDEX IF NOT EXISTS idx_income_date ON income (date DESC);
+
+-- Monthly rollups, maintained by triggers so current-month figures never scan raw history
+CREATE TABLE IF NOT EXISTS monthly_category_rollup (
+    month DATE NOT NULL,  -- First day of the month
+    category TEXT NOT NULL,
+    paid_by TEXT NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, category, paid_by)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_income_rollup (
+    month DATE PRIMARY KEY,  -- First day of the month
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    income_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION apply_expense_rollup()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE monthly_category_rollup
+        SET total_amount = total_amount - OLD.amount, expense_count = expense_count - 1
+        WHERE month = date_trunc('month', OLD.date)::DATE AND category = OLD.category AND paid_by = OLD.paid_by;
+        DELETE FROM monthly_category_rollup
+        WHERE month = date_trunc('month', OLD.date)::DATE AND category = OLD.category AND paid_by = OLD.paid_by
+          AND expense_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_category_rollup (month, category, paid_by, total_amount, expense_count)
+        VALUES (date_trunc('month', NEW.date)::DATE, NEW.category, NEW.paid_by, NEW.amount, 1)
+        ON CONFLICT (month, category, paid_by) DO UPDATE
+        SET total_amount = monthly_category_rollup.total_amount + EXCLUDED.total_amount,
+            expense_count = monthly_category_rollup.expense_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_income_rollup()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE monthly_income_rollup
+        SET total_amount = total_amount - OLD.amount, income_count = income_count - 1
+        WHERE month = date_trunc('month', OLD.date)::DATE;
+        DELETE FROM monthly_income_rollup
+        WHERE month = date_trunc('month', OLD.date)::DATE AND income_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_income_rollup (month, total_amount, income_count)
+        VALUES (date_trunc('month', NEW.date)::DATE, NEW.amount, 1)
+        ON CONFLICT (month) DO UPDATE
+        SET total_amount = monthly_income_rollup.total_amount + EXCLUDED.total_amount,
+            income_count = monthly_income_rollup.income_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS expenses_rollup ON expenses;
+CREATE TRIGGER expenses_rollup
+AFTER INSERT OR UPDATE OF date, category, paid_by, amount OR DELETE ON expenses
+FOR EACH ROW EXECUTE FUNCTION apply_expense_rollup();
+
+DROP TRIGGER IF EXISTS income_rollup ON income;
+CREATE TRIGGER income_rollup
+AFTER INSERT OR UPDATE OF date, amount OR DELETE ON income
+FOR EACH ROW EXECUTE FUNCTION apply_income_rollup();
+
+-- Rebuild rollups from existing rows (safe to re-run; writers wait until it commits)
+BEGIN;
+LOCK TABLE expenses, income IN SHARE ROW EXCLUSIVE MODE;
+DELETE FROM monthly_category_rollup;
+INSERT INTO monthly_category_rollup (month, category, paid_by, total_amount, expense_count)
+SELECT date_trunc('month', date)::DATE, category, paid_by, SUM(amount), COUNT(*)
+FROM expenses
+GROUP BY 1, 2, 3;
+DELETE FROM monthly_income_rollup;
+INSERT INTO monthly_income_rollup (month, total_amount, income_count)
+SELECT date_trunc('month', date)::DATE, SUM(amount), COUNT(*)
+FROM income
+GROUP BY 1;
+COMMIT;
+
+-- Dashboard aggregation RPCs
+-- Called through PostgREST as POST /rest/v1/rpc/<function>, so the dashboard downloads
+-- a few dozen aggregate rows instead of every raw expense. Ranges that span whole months
+-- (what the app always asks for) are answered from the rollups; anything else scans expenses.
+
+CREATE OR REPLACE FUNCTION is_whole_months(p_start DATE, p_end DATE)
+RETURNS BOOLEAN
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT p_start = date_trunc('month', p_start)::DATE
+       AND p_end = (date_trunc('month', p_end) + INTERVAL '1 month - 1 day')::DATE;
+$$;
+
+-- Month totals for the header cards
+CREATE OR REPLACE FUNCTION month_totals(p_start DATE, p_end DATE)
+RETURNS TABLE (total_spent NUMERIC, total_income NUMERIC)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        CASE WHEN is_whole_months(p_start, p_end)
+            THEN COALESCE((SELECT SUM(r.total_amount) FROM monthly_category_rollup r WHERE r.month BETWEEN p_start AND p_end), 0)
+            ELSE COALESCE((SELECT SUM(e.amount) FROM expenses e WHERE e.date BETWEEN p_start AND p_end), 0)
+        END,
+        CASE WHEN is_whole_months(p_start, p_end)
+            THEN COALESCE((SELECT SUM(r.total_amount) FROM monthly_income_rollup r WHERE r.month BETWEEN p_start AND p_end), 0)
+            ELSE COALESCE((SELECT SUM(i.amount) FROM income i WHERE i.date BETWEEN p_start AND p_end), 0)
+        END;
+$$;
+
+-- Spent per category in a date range
+CREATE OR REPLACE FUNCTION category_breakdown(p_start DATE, p_end DATE)
+RETURNS TABLE (category TEXT, amount NUMERIC)
+LANGUAGE sql STABLE AS $$
+    SELECT src.category, SUM(src.amount)
+    FROM (
+        SELECT r.category, r.total_amount AS amount
+        FROM monthly_category_rollup r
+        WHERE is_whole_months(p_start, p_end) AND r.month BETWEEN p_start AND p_end
+        UNION ALL
+        SELECT e.category, e.amount
+        FROM expenses e
+        WHERE NOT is_whole_months(p_start, p_end) AND e.date BETWEEN p_start AND p_end
+    ) AS src
+    GROUP BY src.category
+    ORDER BY src.category;
+$$;
+
+-- Spent per payer in a date range
+CREATE OR REPLACE FUNCTION payer_breakdown(p_start DATE, p_end DATE)
+RETURNS TABLE (paid_by TEXT, amount NUMERIC)
+LANGUAGE sql STABLE AS $$
+    SELECT src.paid_by, SUM(src.amount)
+    FROM (
+        SELECT r.paid_by, r.total_amount AS amount
+        FROM monthly_category_rollup r
+        WHERE is_whole_months(p_start, p_end) AND r.month BETWEEN p_start AND p_end
+        UNION ALL
+        SELECT e.paid_by, e.amount
+        FROM expenses e
+        WHERE NOT is_whole_months(p_start, p_end) AND e.date BETWEEN p_start AND p_end
+    ) AS src
+    GROUP BY src.paid_by
+    ORDER BY src.paid_by;
+$$;
+
+-- Spending bucketed by 'daily', 'weekly', 'monthly' or 'quarterly' since p_since.
+-- Period labels match app.py: YYYY-MM-DD, YYYY-W<iso week>, YYYY-MM, YYYY-Q<n>.
+-- Monthly and quarterly buckets from a month-aligned p_since are read from the rollup.
+CREATE OR REPLACE FUNCTION spending_trend(p_bucket TEXT, p_since DATE)
+RETURNS TABLE (period TEXT, amount NUMERIC)
+LANGUAGE sql STABLE AS $$
+    SELECT bucketed.period, SUM(bucketed.amount)
+    FROM (
+        SELECT
+            CASE p_bucket
+                WHEN 'monthly' THEN to_char(r.month, 'YYYY-MM')
+                WHEN 'quarterly' THEN EXTRACT(YEAR FROM r.month)::INT || '-Q' || EXTRACT(QUARTER FROM r.month)::INT
+            END AS period,
+            r.total_amount AS amount
+        FROM monthly_category_rollup r
+        WHERE p_bucket IN ('monthly', 'quarterly')
+          AND p_since = date_trunc('month', p_since)::DATE
+          AND r.month >= p_since
+        UNION ALL
+        SELECT
+            CASE p_bucket
+                WHEN 'daily' THEN to_char(e.date, 'YYYY-MM-DD')
+                WHEN 'weekly' THEN EXTRACT(YEAR FROM e.date)::INT || '-W' || EXTRACT(WEEK FROM e.date)::INT
+                WHEN 'monthly' THEN to_char(e.date, 'YYYY-MM')
+                WHEN 'quarterly' THEN EXTRACT(YEAR FROM e.date)::INT || '-Q' || EXTRACT(QUARTER FROM e.date)::INT
+            END AS period,
+            e.amount
+        FROM expenses e
+        WHERE NOT (p_bucket IN ('monthly', 'quarterly') AND p_since = date_trunc('month', p_since)::DATE)
+          AND e.date >= p_since
+    ) AS bucketed
+    WHERE bucketed.period IS NOT NULL
+    GROUP BY bucketed.period
+    ORDER BY bucketed.period;
+$$;
+
+-- Scheduler leases
+-- Background jobs (recurring.py) claim a named lease before writing so only one worker runs at a time.
+-- A lease expires on its own if its holder dies without releasing it.
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- True when p_holder now owns the lease (it was free, expired, or already held by p_holder)
+CREATE OR REPLACE FUNCTION acquire_lease(p_name TEXT, p_holder TEXT, p_ttl_seconds INTEGER)
+RETURNS BOOLEAN
+LANGUAGE sql VOLATILE AS $$
+    WITH claimed AS (
+        INSERT INTO scheduler_leases (name, holder, expires_at)
+        VALUES (p_name, p_holder, now() + make_interval(secs => p_ttl_seconds))
+        ON CONFLICT (name) DO UPDATE
+        SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+        WHERE scheduler_leases.expires_at < now() OR scheduler_leases.holder = EXCLUDED.holder
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM claimed);
+$$;
+
+CREATE OR REPLACE FUNCTION release_lease(p_name TEXT, p_holder TEXT)
+RETURNS VOID
+LANGUAGE sql VOLATILE AS $$
+    DELETE FROM scheduler_leases WHERE name = p_name AND holder = p_holder;
+$$;
+
+-- Recurring parents advanced by recurring.py in one statement: only recurrence_next_due is written,
+-- and only on rows whose next due date is still the one the run planned from
+CREATE OR REPLACE FUNCTION advance_recurrences(p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    advanced INTEGER;
+BEGIN
+    UPDATE expenses e
+    SET recurrence_next_due = r.next_due
+    FROM jsonb_to_recordset(COALESCE(p_rows, '[]'::jsonb)) AS r(id TEXT, due DATE, next_due DATE)
+    WHERE e.id = r.id AND e.recurrence_next_due = r.due;
+    GET DIAGNOSTICS advanced = ROW_COUNT;
+    RETURN advanced;
+END;
+$$;
+
+-- Shared rate limits (rate_limit.py): one token bucket per API quota, drawn on by every process.
+-- The row lock serializes concurrent takers, so the webhook and the Streamlit app share one rate.
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    refilled_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+-- Takes p_cost tokens and returns 0, or takes nothing and returns the seconds until they are available
+CREATE OR REPLACE FUNCTION take_rate_tokens(p_name TEXT, p_cost DOUBLE PRECISION, p_rate_per_minute DOUBLE PRECISION, p_burst DOUBLE PRECISION)
+RETURNS DOUBLE PRECISION
+LANGUAGE plpgsql AS $$
+DECLARE
+    available DOUBLE PRECISION;
+    rate DOUBLE PRECISION := p_rate_per_minute / 60.0;
+BEGIN
+    INSERT INTO rate_buckets (name, tokens) VALUES (p_name, p_burst) ON CONFLICT (name) DO NOTHING;
+
+    SELECT LEAST(p_burst, tokens + EXTRACT(EPOCH FROM clock_timestamp() - refilled_at) * rate)
+    INTO available
+    FROM rate_buckets WHERE name = p_name FOR UPDATE;
+
+    UPDATE rate_buckets
+    SET tokens = CASE WHEN available >= p_cost THEN available - p_cost ELSE available END,
+        refilled_at = clock_timestamp()
+    WHERE name = p_name;
+
+    IF available >= p_cost THEN
+        RETURN 0;
+    END IF;
+    RETURN CASE WHEN rate > 0 THEN (p_cost - available) / rate ELSE 1 END;
+END;
+$$;
+
+-- Budget Config save: apply the edited rows and deletions in one transaction
+CREATE OR REPLACE FUNCTION save_category_budgets(p_rows JSONB, p_delete_ids INTEGER[])
+RETURNS SETOF category_budgets
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM category_budgets WHERE id = ANY(p_delete_ids);
+
+    INSERT INTO category_budgets (id, category, group_name, limit_amount, icon)
+    SELECT r.id, r.category, r.group_name, r.limit_amount, r.icon
+    FROM jsonb_to_recordset(p_rows) AS r(id INTEGER, category TEXT, group_name TEXT, limit_amount NUMERIC, icon TEXT)
+    ON CONFLICT (id) DO UPDATE
+    SET category = EXCLUDED.category,
+        group_name = EXCLUDED.group_name,
+        limit_amount = EXCLUDED.limit_amount,
+        icon = EXCLUDED.icon;
+
+    RETURN QUERY SELECT * FROM category_budgets ORDER BY group_name, category;
+END;
+$$;
+
+-- WhatsApp webhook de-duplication (idempotency.py): one row per Twilio MessageSid.
+-- A retried webhook finds its row and is acknowledged without running the agent again.
+CREATE TABLE IF NOT EXISTS processed_messages (
+    message_sid TEXT PRIMARY KEY,
+    reply TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+-- Rows older than idempotency.RETENTION_DAYS are pruned by the webhook (webhook_agent.prune_worker)
+CREATE INDEX IF NOT EXISTS idx_processed_messages_created_at ON processed_messages (created_at);
+
+-- Agent writes for one message (agent_engine.log_transactions): every row or none.
+-- Ids come from the caller; rows that already exist (a retried message) are skipped.
+CREATE OR REPLACE FUNCTION log_transactions(p_expenses JSONB, p_income JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    expense_count INTEGER;
+    income_count INTEGER;
+BEGIN
+    INSERT INTO expenses (id, date, item, category, amount, paid_by, notes)
+    SELECT r.id, r.date, r.item, r.category, r.amount, r.paid_by, r.notes
+    FROM jsonb_to_recordset(COALESCE(p_expenses, '[]'::jsonb))
+        AS r(id TEXT, date DATE, item TEXT, category TEXT, amount NUMERIC, paid_by TEXT, notes TEXT)
+    ON CONFLICT (id) DO NOTHING;
+    GET DIAGNOSTICS expense_count = ROW_COUNT;
+
+    INSERT INTO income (id, date, source, amount, notes)
+    SELECT r.id, r.date, r.source, r.amount, r.notes
+    FROM jsonb_to_recordset(COALESCE(p_income, '[]'::jsonb))
+        AS r(id TEXT, date DATE, source TEXT, amount NUMERIC, notes TEXT)
+    ON CONFLICT (id) DO NOTHING;
+    GET DIAGNOSTICS income_count = ROW_COUNT;
+
+    RETURN expense_count + income_count;
+END;
+$$;
@@ -0,0 +1,146 @@
+import argparse
+import os
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+import supabase_client
+import data_access
+
+# Recurring-expense materialization, run outside the Streamlit page load:
+#   python recurring.py                    # one run (e.g. from a daily cron job)
+#   python recurring.py --daily            # long-running worker, one run per day
+#   python recurring.py --interval 3600    # long-running worker, one run per hour
+#   python recurring.py --until 2026-12-31 --dry-run   # preview a backfill
+# Only one worker materializes at a time: each run holds the "recurring_expenses" lease row
+# (scheduler_leases table, see migration.sql) and skips when another holder's lease is live.
+
+LEASE_NAME = "recurring_expenses"
+LEASE_TTL_SECONDS = 300
+
+def calculate_next_date(date_str: str, frequency: str) -> str:
+    """Calculate next recurring date"""
+    date = datetime.strptime(date_str, '%Y-%m-%d')
+    if frequency == 'weekly':
+        date += timedelta(days=7)
+    else:  # monthly
+        date += relativedelta(months=1)
+    return date.strftime('%Y-%m-%d')
+
+def recurring_instance_id(parent_id: str, due_date: str) -> str:
+    """Deterministic id for the instance of a recurring expense due on a given date.
+
+    Re-running the catch-up produces the same ids, so already-posted instances are skipped.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"family-budget/recurring/{parent_id}/{due_date}"))
+
+def plan_recurring_expenses(recurring, until):
+    """Compute every instance due on or before `until` and each parent's advanced next_due (no I/O)"""
+    instances = []
+    advances = []
+    for expense in recurring:
+        next_due_str = expense['recurrence_next_due']
+        next_due = datetime.strptime(next_due_str, '%Y-%m-%d').date()
+        
+        # Create expenses while next_due is on or before the cut-off
+        while next_due <= until:
+            due_str = next_due.strftime('%Y-%m-%d')
+            instances.append({
+                "id": recurring_instance_id(expense['id'], due_str),
+                "date": due_str,
+                "item": expense['item'],
+                "category": expense['category'],
+                "amount": expense['amount'],
+                "paid_by": expense['paid_by'],
+                "notes": expense.get('notes', ''),
+                "recurrence_frequency": expense['recurrence_frequency'],
+                "recurrence_next_due": None,
+                "recurrence_active": 0
+            })
+            next_due = datetime.strptime(calculate_next_date(due_str, expense['recurrence_frequency']), '%Y-%m-%d').date()
+        
+        advances.append({"id": expense['id'], "item": expense['item'], "due": next_due_str, "next_due": next_due.strftime('%Y-%m-%d')})
+    return instances, advances
+
+class RecurringScheduler:
+    """Materializes due recurring expenses through a data_access.Repository"""
+    def __init__(self, repository, holder=None):
+        self.repository = repository
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+
+    def acquire_lease(self):
+        return bool(self.repository.call_rpc("acquire_lease", {"p_name": LEASE_NAME, "p_holder": self.holder, "p_ttl_seconds": LEASE_TTL_SECONDS}))
+
+    def release_lease(self):
+        self.repository.call_rpc("release_lease", {"p_name": LEASE_NAME, "p_holder": self.holder})
+
+    def fetch_due(self, until):
+        return self.repository.due_recurring_expenses(until.strftime('%Y-%m-%d'))
+
+    def run_once(self, until, dry_run=False):
+        """One materialization pass. Returns the number of instances planned (dry run) or posted, or None if skipped."""
+        if dry_run:
+            instances, advances = plan_recurring_expenses(self.fetch_due(until), until)
+            for instance in instances:
+                print(f"[dry-run] {instance['date']}  {instance['item']}  ৳{instance['amount']}  ({instance['category']})")
+            for advance in advances:
+                print(f"[dry-run] advance {advance['item']} next due -> {advance['next_due']}")
+            return len(instances)
+
+        if not self.acquire_lease():
+            print("Another worker holds the recurring_expenses lease; skipping this run.")
+            return None
+        try:
+            instances, advances = plan_recurring_expenses(self.fetch_due(until), until)
+            # Instances first, then parents: a crash in between is repaired by the next run,
+            # whose deterministic ids make the re-sent instances no-ops.
+            if instances:
+                self.repository.add_expenses(instances, ignore_duplicates=True, return_rows=False)
+            # One guarded write for every parent: only recurrence_next_due, and only while it still holds
+            # the value we planned from, so edits made to the parent in the app meanwhile are kept
+            if advances:
+                self.repository.advance_recurrences(advances)
+            return len(instances)
+        finally:
+            self.release_lease()
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize due recurring expenses")
+    parser.add_argument("--until", type=parse_date, help="Materialize instances due on or before this date (default: today)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would be posted without writing anything")
+    parser.add_argument("--interval", type=float, default=0, help="Seconds between runs; 0 runs once and exits")
+    parser.add_argument("--daily", action="store_true", help="Shortcut for --interval 86400")
+    args = parser.parse_args(argv)
+
+    secrets = supabase_client.load_secrets()
+    url = secrets.get("supabase", {}).get("url") or os.environ.get("SUPABASE_URL")
+    api_key = secrets.get("supabase", {}).get("api_key") or os.environ.get("SUPABASE_KEY")
+    if not url or not api_key:
+        sys.exit("Error: Supabase credentials not found in secrets.toml or SUPABASE_URL / SUPABASE_KEY")
+
+    scheduler = RecurringScheduler(data_access.Repository(data_access.PostgrestBackend(url, api_key)))
+    interval = 86400 if args.daily else args.interval
+    while True:
+        until = args.until or datetime.now().date()
+        try:
+            count = scheduler.run_once(until, dry_run=args.dry_run)
+            if count is not None:
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} recurring run up to {until}: {count} instance(s){' (dry run)' if args.dry_run else ''}")
+        except supabase_client.SupabaseError as e:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} recurring run failed: {e}")
+            if not interval:
+                sys.exit(1)
+        if not interval:
+            break
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    main()
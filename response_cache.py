@@ -0,0 +1,74 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import fast_parser
+
+# Cache of the agent's tool calls keyed on normalized message text.
+# Family members resend the same message ("rickshaw 60", "bus 40 by ruhi") every day; instead of
+# another Gemini round trip, a hit replays the recorded log_expense/log_income calls, which stamp
+# today's date. Only the tool calls and the reply are stored, never the written rows.
+
+MAX_ENTRIES = int(os.environ.get("AGENT_RESPONSE_CACHE_SIZE", "512"))
+TTL_SECONDS = int(os.environ.get("AGENT_RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+
+def format_amount(value):
+    return str(int(value)) if value == int(value) else f"{value:.2f}".rstrip("0")
+
+def normalize(text):
+    """Case, whitespace, Bangla digits and amount formatting ("৳1,200.00", "1.2k tk" -> "1200")"""
+    text = fast_parser.normalize_digits(text).lower()
+    text = fast_parser.AMOUNT_RE.sub(
+        lambda m: f" {format_amount(fast_parser.parse_amount(m.group(1), m.group(2)))} ", text
+    )
+    text = re.sub(r"[\s]+", " ", text)
+    return text.strip(" .!?")
+
+class ResponseCache:
+    """Thread-safe LRU of normalized text -> (tool calls, reply) with a TTL and hit-rate counters"""
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, calls, reply)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text):
+        """Return (calls, reply) for a cached message, or None. calls: [(tool name, kwargs), ...]"""
+        key = normalize(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [(name, dict(kwargs)) for name, kwargs in entry[1]], entry[2]
+
+    def set(self, text, calls, reply):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        key = normalize(text)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, [(name, dict(kwargs)) for name, kwargs in calls], reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared, pooled HTTP client for the Supabase REST API.
+# app.py, agent_engine.py and webhook_agent.py all go through get_session() so that
+# TCP+TLS connections to PostgREST are kept alive and reused across Streamlit reruns
+# and WhatsApp messages instead of being opened for every request.
+
+# Tunables (override through environment variables)
+POOL_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("SUPABASE_POOL_MAXSIZE", "16"))
+MAX_RETRIES = int(os.environ.get("SUPABASE_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.environ.get("SUPABASE_BACKOFF_FACTOR", "0.3"))
+DEFAULT_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "10"))
+
+# Only idempotent methods are retried; a POST that reached the server must not be replayed.
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PATCH"])
+RETRY_STATUSES = (429, 502, 503, 504)
+
+def load_secrets():
+    """Read .streamlit/secrets.toml for scripts that run without streamlit"""
+    secrets_path = os.path.join(".streamlit", "secrets.toml")
+    if os.path.exists(secrets_path):
+        try:
+             # tomllib is standard in Python 3.11+
+             import tomllib
+        except ImportError:
+             import toml as tomllib
+             
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f)
+    return {}
+
+_session = None
+_session_lock = threading.Lock()
+
+def build_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                  max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """Create a requests.Session with a keep-alive connection pool and retry/backoff"""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the final response back so callers can report it
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+def close_session():
+    """Close the pooled session (e.g. on webhook shutdown)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def rest_headers(api_key, extra=None):
+    """Standard PostgREST headers for the given Supabase key"""
+    headers = {
+        "apikey": api_key,
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Prefer": "return=representation"
+    }
+    if extra:
+        headers.update(extra)
+    return headers
+
+def rest_request(base_url, api_key, method, table, data=None, params=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    """Send a request to {base_url}/rest/v1/{table} over the pooled session and return the raw response"""
+    url = f"{base_url}/rest/v1/{table}"
+    return get_session().request(
+        method, url, json=data, params=params,
+        headers=rest_headers(api_key, headers), timeout=timeout
+    )
+
+class SupabaseError(Exception):
+    """Raised when a PostgREST call fails (HTTP error status or transport error)"""
+    def __init__(self, method, table, message, status=None):
+        self.method = method
+        self.table = table
+        self.status = status
+        super().__init__(message)
+
+def copy_rows(rows):
+    """Shallow copy of a row list (each row dict copied); anything else is returned as is"""
+    if isinstance(rows, list):
+        return [dict(row) if isinstance(row, dict) else row for row in rows]
+    return rows
+
+class ReadCache:
+    """Thread-safe TTL + LRU cache for PostgREST reads.
+
+    Entries are keyed by (table, query params) and expire after the table's TTL.
+    Writers call invalidate(table) so the next read of that table goes back to the network.
+    Rows are copied on the way in and out, so callers own the rows they get and may edit them.
+    """
+    def __init__(self, ttls=None, default_ttl=60, max_entries=128):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, rows)
+        self._generations = {}  # table -> bumped on every invalidate, guards against stale fills
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(table, params=None):
+        items = []
+        for name, value in sorted((params or {}).items()):
+            if isinstance(value, (list, tuple)):
+                value = tuple(value)
+            items.append((name, value))
+        return (table, tuple(items))
+
+    def get(self, table, params=None):
+        """Return (hit, rows). Rows are copies: changing them never changes the cached entry."""
+        key = self.make_key(table, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            rows = entry[1]
+        return True, copy_rows(rows)
+
+    def generation(self, table):
+        """Snapshot to pass to set(); a write in between makes that set() a no-op"""
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def set(self, table, params, rows, generation=None):
+        key = self.make_key(table, params)
+        ttl = self.ttls.get(table, self.default_ttl)
+        if ttl <= 0:
+            return
+        rows = copy_rows(rows)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(table, 0):
+                return  # Table was written while this read was in flight
+            self._entries[key] = (time.monotonic() + ttl, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table=None):
+        """Drop every cached read of `table` (or everything when table is None)"""
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+                for name in self._generations:
+                    self._generations[name] += 1
+            else:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in [k for k in self._entries if k[0] == table]:
+                    del self._entries[key]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are top-level scripts rather than a package, as in benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
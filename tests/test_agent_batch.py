@@ -0,0 +1,34 @@
+import pytest
+
+import data_access
+import rate_limit
+
+CATEGORIES = ["Groceries & Food", "Monthly Rent", "Office Commute (Hadi)", "Office Commute (Ruhi)"]
+
+@pytest.fixture
+def batch(monkeypatch):
+    agent_batch = pytest.importorskip("agent_batch", exc_type=ImportError)
+    monkeypatch.setattr(agent_batch.agent_engine, "repository", data_access.Repository(data_access.MemoryBackend()))
+    monkeypatch.setattr(agent_batch.agent_engine, "gemini_limiter", rate_limit.RateLimiter())
+    return agent_batch
+
+def test_read_messages_keeps_line_numbers():
+    agent_batch = pytest.importorskip("agent_batch", exc_type=ImportError)
+    messages = agent_batch.read_messages(["groceries 500\n", "\n", '{"text": "rent 15000", "date": "2026-10-01"}\n'])
+    assert messages == [{"text": "groceries 500", "date": None, "line": 1},
+                        {"text": "rent 15000", "date": "2026-10-01", "line": 3}]
+
+def test_importing_the_same_file_twice_writes_nothing_new(batch):
+    messages = batch.read_messages(["groceries 500", "rent 15000", "salary 85000"])
+    first = batch.run_batch(messages, categories=CATEGORIES, source="/data/october.txt")
+    again = batch.run_batch(messages, categories=CATEGORIES, source="/data/october.txt")
+    assert [r["rows"][0]["id"] for r in first] == [r["rows"][0]["id"] for r in again]
+    tables = batch.agent_engine.repository.backend.tables
+    assert (len(tables["expenses"]), len(tables["income"])) == (2, 1)
+
+def test_row_ids_depend_on_file_and_line(batch):
+    ids = lambda messages, source: [r["rows"][0]["id"] for r in batch.run_batch(messages, categories=CATEGORIES, source=source, dry_run=True)]
+    one = ids(batch.read_messages(["groceries 500"]), "/data/october.txt")
+    assert ids(batch.read_messages(["groceries 500"]), "/data/november.txt") != one
+    assert ids(batch.read_messages(["", "groceries 500"]), "/data/october.txt") != one
+    assert ids(batch.read_messages(["groceries 500"]), None) != ids(batch.read_messages(["groceries 500"]), None)
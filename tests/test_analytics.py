@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+analytics = pytest.importorskip("analytics", exc_type=ImportError)
+
+def frame(*rows):
+    """(date, amount) pairs -> typed expense frame"""
+    return analytics.expense_frame([{"date": d, "category": "Other", "paid_by": "Hadi", "amount": a} for d, a in rows])
+
+def totals(expenses, time_frame):
+    return analytics.period_totals(expenses, time_frame).to_dict()
+
+def test_weekly_labels_split_the_iso_week_spanning_new_year():
+    # 2025-12-29 (Mon) .. 2026-01-04 (Sun) is ISO week 1 of 2026; labels use the calendar year like trend_skeleton
+    expenses = frame(("2025-12-28", 1), ("2025-12-29", 10), ("2025-12-31", 20), ("2026-01-01", 30), ("2026-01-05", 40))
+    assert totals(expenses, "weekly") == {"2025-W52": 1, "2025-W1": 30, "2026-W1": 30, "2026-W2": 40}
+
+def test_weekly_label_for_iso_week_53():
+    # 2027-01-01 is a Friday in ISO week 53 of 2026
+    assert totals(frame(("2026-12-31", 5), ("2027-01-01", 7)), "weekly") == {"2026-W53": 5, "2027-W53": 7}
+
+def test_quarter_labels_and_empty_quarters():
+    expenses = frame(("2025-12-31", 1), ("2026-03-31", 2), ("2026-04-01", 4), ("2026-10-18", 8))
+    assert totals(expenses, "quarterly") == {"2025-Q4": 1, "2026-Q1": 2, "2026-Q2": 4, "2026-Q3": 0, "2026-Q4": 8}
+
+def test_monthly_and_daily_labels():
+    expenses = frame(("2026-08-31", 1), ("2026-10-01", 2), ("2026-10-01", 3))
+    assert totals(expenses, "monthly") == {"2026-08": 1, "2026-09": 0, "2026-10": 5}
+    assert list(analytics.period_totals(expenses, "daily").index[[0, -1]]) == ["2026-08-31", "2026-10-01"]
+
+def test_unknown_time_frame_is_empty():
+    assert analytics.period_totals(frame(("2026-10-01", 1)), "yearly").empty
+
+TODAY = datetime(2026, 10, 18)
+
+@pytest.mark.parametrize("time_frame, buckets", [("daily", 30), ("weekly", 12), ("monthly", 12), ("quarterly", 4)])
+def test_spending_trend_is_zero_filled_to_the_skeleton(time_frame, buckets):
+    trend = analytics.spending_trend(frame(), time_frame, TODAY)
+    skeleton, _ = analytics.trend_skeleton(time_frame, TODAY)
+    assert [k for k, _ in trend] == sorted(skeleton)
+    assert len(trend) == buckets
+    assert all(amount == 0 for _, amount in trend)
+
+def test_quarterly_trend_starts_at_the_oldest_quarter():
+    expenses = frame(("2025-12-31", 1), ("2026-01-01", 2), ("2026-04-01", 4), ("2026-10-18", 8))
+    assert analytics.spending_trend(expenses, "quarterly", TODAY) == [("2026-Q1", 2), ("2026-Q2", 4), ("2026-Q3", 0), ("2026-Q4", 8)]
+
+def test_weekly_trend_across_new_year():
+    today = datetime(2026, 1, 14)
+    skeleton, since = analytics.trend_skeleton("weekly", today)
+    assert since == "2025-10-27"  # Monday of the oldest week shown
+    expenses = frame(("2025-10-26", 100), ("2025-10-27", 1), ("2025-12-24", 2), ("2025-12-31", 4), ("2026-01-14", 8))
+    trend = dict(analytics.spending_trend(expenses, "weekly", today))
+    assert list(trend) == sorted(skeleton)
+    assert (trend["2025-W44"], trend["2025-W52"], trend["2025-W1"], trend["2026-W3"]) == (1, 2, 4, 8)
+    assert sum(trend.values()) == 15
+
+def test_daily_trend_drops_days_outside_the_window():
+    expenses = frame(("2026-09-18", 100), ("2026-09-19", 1), ("2026-10-18", 2))
+    trend = analytics.spending_trend(expenses, "daily", TODAY)
+    assert (trend[0], trend[-1]) == (("2026-09-19", 1), ("2026-10-18", 2))
+    assert sum(amount for _, amount in trend) == 3
@@ -0,0 +1,165 @@
+import pytest
+
+import data_access
+from supabase_client import ReadCache, SupabaseError
+
+def expense(id, date, amount=100, **fields):
+    return {"id": id, "date": date, "item": f"Item {id}", "category": "Other", "amount": amount, "paid_by": "Hadi", "notes": "", **fields}
+
+def repository(tables=None, rpcs=None):
+    return data_access.Repository(data_access.MemoryBackend(tables, rpcs), cache=ReadCache(default_ttl=60))
+
+# history_page: keyset pagination on (date, id)
+
+# Several rows per day so pages break inside a day; ids with a comma and a quote exercise the cursor quoting
+HISTORY = [
+    expense("a", "2026-10-03"), expense("c", "2026-10-03"), expense("b,2", "2026-10-03"),
+    expense("d", "2026-10-02"), expense("e'x", "2026-10-02"),
+    expense("f", "2026-10-01"), expense("g", "2026-10-01"), expense("h", "2026-09-30"),
+]
+NEWEST_FIRST = [row["id"] for row in sorted(HISTORY, key=lambda r: (r["date"], r["id"]), reverse=True)]
+
+def walk(repo, page_size, before_date=None):
+    """Every page in order as ([ids], has_more)"""
+    pages, cursor = [], None
+    while True:
+        rows, has_more = repo.history_page("expenses", cursor=cursor, before_date=before_date, page_size=page_size)
+        pages.append(([row["id"] for row in rows], has_more))
+        if not has_more:
+            return pages
+        cursor = (rows[-1]["date"], rows[-1]["id"])
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 8, 50])
+def test_history_pages_cover_every_row_once_in_order(page_size):
+    pages = walk(repository({"expenses": HISTORY}), page_size)
+    assert [i for ids, _ in pages for i in ids] == NEWEST_FIRST
+    assert all(len(ids) == page_size and has_more for ids, has_more in pages[:-1])
+    assert not pages[-1][1]
+
+def test_history_page_starts_at_before_date():
+    pages = walk(repository({"expenses": HISTORY}), 2, before_date="2026-10-02")
+    assert [i for ids, _ in pages for i in ids] == [i for i in NEWEST_FIRST if i not in ("a", "b,2", "c")]
+
+def test_history_page_is_cached_until_the_table_is_written():
+    repo = repository({"expenses": HISTORY})
+    first, _ = repo.history_page("expenses", page_size=2)
+    repo.backend.tables["expenses"].append(expense("z", "2026-10-04"))  # Behind the repository's back
+    assert repo.history_page("expenses", page_size=2)[0] == first
+    repo.add_expenses([expense("y", "2026-10-05")])
+    assert [row["id"] for row in repo.history_page("expenses", page_size=2)[0]] == ["y", "z"]
+
+def test_cached_rows_are_copies():
+    repo = repository({"expenses": HISTORY})
+    rows, _ = repo.history_page("expenses", page_size=2)
+    rows[0]["amount"] = 1  # e.g. an optimistic edit of the displayed row
+    rows.pop()
+    cached, _ = repo.history_page("expenses", page_size=2)
+    assert [(row["id"], row["amount"]) for row in cached] == [("c", 100), ("b,2", 100)]
+
+# Deletes with in.() filters
+
+def test_delete_with_in_filter_removes_only_listed_ids():
+    repo = repository({"expenses": HISTORY})
+    removed = repo.delete("expenses", {"id": 'in.(a,"b,2",h)'})
+    assert sorted(row["id"] for row in removed) == ["a", "b,2", "h"]
+    assert sorted(row["id"] for row in repo.backend.tables["expenses"]) == ["c", "d", "e'x", "f", "g"]
+
+BUDGETS = [
+    {"id": 1, "category": "Rent", "group_name": "HOUSING", "limit_amount": 15000, "icon": "🏠"},
+    {"id": 2, "category": "Groceries", "group_name": "FOOD", "limit_amount": 12000, "icon": "🛒"},
+    {"id": 3, "category": "Dining", "group_name": "FOOD", "limit_amount": 4000, "icon": "🍽️"},
+    {"id": 11, "category": "Fuel", "group_name": "TRANSPORT", "limit_amount": 3000, "icon": "⛽"},
+]
+
+def test_save_budgets_without_rpc_upserts_and_deletes_with_in_filter():
+    repo = repository({"category_budgets": BUDGETS})
+    repo.save_budgets([{**BUDGETS[1], "limit_amount": 13000}, {"category": "Pets", "group_name": "FAMILY", "limit_amount": 500, "icon": "🐾"}], [1, 11])
+    rows = {row["category"]: row for row in repo.backend.tables["category_budgets"]}
+    assert sorted(rows) == ["Dining", "Groceries", "Pets"]
+    assert rows["Groceries"]["limit_amount"] == 13000
+    assert rows["Pets"]["id"] == 12  # Serial ids continue after the highest one
+    assert "save_category_budgets" in repo.missing_rpcs
+
+def test_save_budgets_uses_rpc_when_deployed():
+    calls = []
+    repo = repository({"category_budgets": BUDGETS}, rpcs={"save_category_budgets": lambda backend, **args: calls.append(args)})
+    repo.save_budgets([], [3])
+    assert calls == [{"p_rows": [], "p_delete_ids": [3]}]
+    assert len(repo.backend.tables["category_budgets"]) == len(BUDGETS)
+
+# Inserts: plain, ignore-duplicates and merge-duplicates
+
+def test_plain_insert_of_an_existing_key_fails_and_writes_nothing():
+    repo = repository({"expenses": [expense("a", "2026-10-01")]})
+    with pytest.raises(SupabaseError) as error:
+        repo.add_expenses([expense("b", "2026-10-02"), expense("a", "2026-10-03")])
+    assert error.value.status == 409
+    assert [row["id"] for row in repo.backend.tables["expenses"]] == ["a"]
+
+def test_ignore_duplicates_keeps_existing_rows_and_returns_only_new_ones():
+    repo = repository({"expenses": [expense("a", "2026-10-01", amount=100)]})
+    written = repo.add_expenses([expense("a", "2026-10-01", amount=999), expense("b", "2026-10-02")], ignore_duplicates=True)
+    assert [row["id"] for row in written] == ["b"]
+    assert {row["id"]: row["amount"] for row in repo.backend.tables["expenses"]} == {"a": 100, "b": 100}
+
+def test_merge_duplicates_updates_existing_rows():
+    repo = repository({"settings": [{"key": "theme", "value": "light"}]})
+    repo.set_setting("theme", "dark")
+    repo.set_setting("currency", "BDT")
+    assert repo.get_setting("theme") == "dark"
+    assert repo.get_setting("currency") == "BDT"
+    assert len(repo.backend.tables["settings"]) == 2
+
+def test_unique_column_conflict_fails():
+    repo = repository({"category_budgets": BUDGETS})
+    with pytest.raises(SupabaseError) as error:
+        repo.add_budgets([{"category": "Rent", "group_name": "HOUSING", "limit_amount": 1, "icon": "🏠"}])
+    assert error.value.status == 409
+
+def test_log_transactions_fallback_skips_rows_already_written():
+    repo = repository()
+    rows = [expense("a", "2026-10-01")], [{"id": "i", "date": "2026-10-01", "source": "Salary", "amount": 5000, "notes": ""}]
+    assert repo.log_transactions(*rows) == 2
+    assert repo.log_transactions(*rows) == 0  # A retried message
+    assert len(repo.backend.tables["expenses"]) == len(repo.backend.tables["income"]) == 1
+
+class FailingIncomeBackend(data_access.MemoryBackend):
+    def insert(self, table, rows, resolution=None, return_rows=True):
+        if table == "income":
+            raise SupabaseError("POST", table, "connection reset", status=None)
+        return super().insert(table, rows, resolution, return_rows)
+
+def test_log_transactions_fallback_removes_expenses_when_income_fails():
+    repo = data_access.Repository(FailingIncomeBackend({"expenses": [expense("old", "2026-09-01")]}))
+    with pytest.raises(SupabaseError):
+        repo.log_transactions([expense("old", "2026-09-01"), expense("new", "2026-10-01")],
+                              [{"id": "i", "date": "2026-10-01", "source": "Salary", "amount": 5000, "notes": ""}])
+    # Only the row this call inserted is removed; the pre-existing one stays
+    assert [row["id"] for row in repo.backend.tables["expenses"]] == ["old"]
+
+# Recurring parents
+
+def test_advance_recurrence_only_moves_the_planned_due_date():
+    repo = repository({"expenses": [expense("p", "2026-08-01", recurrence_next_due="2026-09-01", recurrence_active=1)]})
+    repo.update_expense("p", {"amount": 250})  # Edited in the app after the scheduler planned
+    assert repo.advance_recurrence("p", "2026-09-01", "2026-10-01")
+    assert not repo.advance_recurrence("p", "2026-09-01", "2026-11-01")  # Stale plan
+    row, = repo.backend.tables["expenses"]
+    assert (row["amount"], row["recurrence_next_due"]) == (250, "2026-10-01")
+
+def test_advance_recurrences_without_rpc_falls_back_to_guarded_patches():
+    repo = repository({"expenses": [
+        expense("p", "2026-08-01", recurrence_next_due="2026-09-01", recurrence_active=1),
+        expense("q", "2026-08-01", recurrence_next_due="2026-09-20", recurrence_active=1),
+    ]})
+    moved = repo.advance_recurrences([{"id": "p", "due": "2026-09-01", "next_due": "2026-10-01"},
+                                      {"id": "q", "due": "2026-09-15", "next_due": "2026-10-15"}])
+    assert moved == 1
+    assert {row["id"]: row["recurrence_next_due"] for row in repo.backend.tables["expenses"]} == {"p": "2026-10-01", "q": "2026-09-20"}
+
+def test_advance_recurrences_is_one_rpc_when_deployed():
+    calls = []
+    repo = repository({"expenses": []}, rpcs={"advance_recurrences": lambda backend, p_rows: calls.append(p_rows) or len(p_rows)})
+    advances = [{"id": "p", "item": "Rent", "due": "2026-09-01", "next_due": "2026-10-01"}]
+    assert repo.advance_recurrences(advances) == 1
+    assert calls == [[{"id": "p", "due": "2026-09-01", "next_due": "2026-10-01"}]]
@@ -0,0 +1,158 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import data_access
+import extraction
+import rate_limit
+
+CATEGORIES = ["Groceries & Food", "Monthly Rent", "Other"]
+
+def model_reply(*results):
+    """JSON in RESPONSE_SCHEMA's shape: model_reply((1, [transaction, ...]), ...)"""
+    return json.dumps({"results": [{"message": number, "transactions": transactions} for number, transactions in results]})
+
+def expense(**fields):
+    return {"type": "expense", "item": "Fish", "amount": 500, "category": "Groceries & Food", "paid_by": "Hadi", **fields}
+
+def income(**fields):
+    return {"type": "income", "source": "Salary", "amount": 50000, **fields}
+
+# parse_response
+
+def test_parse_response_maps_message_numbers_to_transactions():
+    text = model_reply((1, [expense()]), (2, [income(), expense(item="Rice")]))
+    assert extraction.parse_response(text, 2) == {1: [expense()], 2: [income(), expense(item="Rice")]}
+
+def test_parse_response_strips_a_json_fence():
+    text = "```json\n" + model_reply((1, [expense()])) + "\n```"
+    assert extraction.parse_response(text, 1) == {1: [expense()]}
+
+def test_parse_response_accepts_a_bare_results_list():
+    assert extraction.parse_response(json.dumps([{"message": 1, "transactions": [income()]}]), 1) == {1: [income()]}
+
+def test_parse_response_skips_entries_it_cannot_place():
+    text = json.dumps({"results": [
+        {"message": 0, "transactions": [expense()]},
+        {"message": 3, "transactions": [expense()]},
+        {"message": "1", "transactions": [expense()]},
+        "not an object",
+        {"message": 2, "transactions": "not a list"},
+    ]})
+    assert extraction.parse_response(text, 2) == {2: []}
+
+@pytest.mark.parametrize("text", [model_reply(), json.dumps({"results": [{"message": 1, "transactions": None}]})])
+def test_parse_response_empty_output(text):
+    assert extraction.parse_response(text, 1).get(1, []) == []
+
+@pytest.mark.parametrize("text", ["", "   ", "Sorry, I can't help with that", "{\"results\": [", json.dumps({"results": {}}), json.dumps("text")])
+def test_parse_response_rejects_malformed_output(text):
+    with pytest.raises(ValueError):
+        extraction.parse_response(text, 1)
+
+# validate_transaction
+
+def test_validate_expense_normalizes_category_and_payer():
+    tool, kwargs, date = extraction.validate_transaction(expense(category="groceries & food", paid_by=" ruhi ", amount="1200"), CATEGORIES)
+    assert tool == "log_expense"
+    assert kwargs == {"item": "Fish", "amount": 1200.0, "category": "Groceries & Food", "paid_by": "Ruhi", "notes": ""}
+    assert date is None
+
+def test_validate_expense_defaults_payer_and_falls_back_to_other():
+    _, kwargs, _ = extraction.validate_transaction(expense(category="Pets", paid_by=None), CATEGORIES)
+    assert kwargs["category"] == "Other"
+    assert kwargs["paid_by"] == "Hadi"
+
+def test_validate_income_keeps_date():
+    tool, kwargs, date = extraction.validate_transaction(income(date="2026-10-01", notes="October"), CATEGORIES)
+    assert tool == "log_income"
+    assert kwargs == {"source": "Salary", "amount": 50000.0, "notes": "October"}
+    assert date == "2026-10-01"
+
+@pytest.mark.parametrize("transaction", [
+    expense(amount=0),
+    expense(amount=-50),
+    expense(amount="five hundred"),
+    expense(amount=None),
+    expense(date="01/10/2026"),
+    expense(item="  "),
+    expense(paid_by="Bob"),
+    expense(type="transfer"),
+    income(source=""),
+    "spent 500 on fish",
+])
+def test_validate_rejects_invalid_transactions(transaction):
+    with pytest.raises(ValueError):
+        extraction.validate_transaction(transaction, CATEGORIES)
+
+def test_validate_rejects_unknown_category_without_fallback():
+    with pytest.raises(ValueError):
+        extraction.validate_transaction(expense(category="Pets"), ["Groceries & Food"])
+
+# run_structured, with a stub extraction model and an in-memory database
+
+class StubModel:
+    """Stands in for get_extraction_model(): returns a canned reply and records the prompts"""
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.text)
+
+@pytest.fixture
+def engine(monkeypatch):
+    agent_engine = pytest.importorskip("agent_engine", exc_type=ImportError)
+    backend = data_access.MemoryBackend({
+        "category_budgets": [{"id": i, "category": c, "group_name": "TEST", "limit_amount": 1000, "icon": "🏷️"} for i, c in enumerate(CATEGORIES, 1)],
+    })
+    monkeypatch.setattr(agent_engine, "repository", data_access.Repository(backend))
+    monkeypatch.setattr(agent_engine, "gemini_limiter", rate_limit.RateLimiter())
+
+    def run(text):
+        model = StubModel(text)
+        monkeypatch.setattr(agent_engine, "get_extraction_model", lambda api_key: model)
+        return agent_engine.run_structured("message", "key"), model
+
+    return SimpleNamespace(run=run, tables=backend.tables)
+
+def test_run_structured_logs_valid_output(engine):
+    reply, model = engine.run(model_reply((1, [expense(paid_by="Ruhi"), income(date="2026-10-01")])))
+    assert reply.splitlines() == [
+        "✅ Logged expense: ৳500 for Fish (Groceries & Food), paid by Ruhi",
+        "💰 Logged income: ৳50,000 from Salary",
+    ]
+    assert [(e["item"], e["paid_by"]) for e in engine.tables["expenses"]] == [("Fish", "Ruhi")]
+    assert [(i["source"], i["date"]) for i in engine.tables["income"]] == [("Salary", "2026-10-01")]
+    assert all(c in model.prompts[0] for c in CATEGORIES)
+
+def test_run_structured_writes_nothing_when_an_item_is_invalid(engine):
+    reply, _ = engine.run(model_reply((1, [expense(), expense(item="Rent", amount=-1)])))
+    assert "❌ Item 2" in reply
+    assert "Nothing was saved" in reply
+    assert not engine.tables.get("expenses")
+
+@pytest.mark.parametrize("text", [model_reply((1, [])), model_reply(), model_reply((2, [expense()]))])
+def test_run_structured_empty_output(engine, text):
+    reply, _ = engine.run(text)
+    assert reply == extraction.NO_TRANSACTIONS_REPLY
+    assert not engine.tables.get("expenses") and not engine.tables.get("income")
+
+@pytest.mark.parametrize("text", ["", "I logged it for you!", "{\"results\": "])
+def test_run_structured_malformed_output(engine, text):
+    reply, _ = engine.run(text)
+    assert reply.startswith("Sorry, I couldn't understand that")
+    assert not engine.tables.get("expenses") and not engine.tables.get("income")
+
+def test_process_message_reads_and_writes_through_the_given_repository(engine, monkeypatch):
+    agent_engine = pytest.importorskip("agent_engine", exc_type=ImportError)
+    page = data_access.MemoryBackend({"category_budgets": [{"id": 1, "category": "Groceries & Food", "group_name": "TEST", "limit_amount": 1, "icon": "🛒"}]})
+    monkeypatch.setattr(agent_engine, "get_extraction_model", lambda api_key: StubModel(model_reply((1, [expense()]))))
+    monkeypatch.setattr(agent_engine, "configure_genai", lambda api_key: None)
+    agent_engine.process_message("fish 500", api_key="key", use_fast_path=False, use_cache=False, mode="structured",
+                                 repository=data_access.Repository(page))
+    assert [e["item"] for e in page.tables["expenses"]] == ["Fish"]
+    assert "expenses" not in engine.tables
+    assert agent_engine.current_repository() is agent_engine.repository
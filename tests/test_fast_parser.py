@@ -0,0 +1,91 @@
+import json
+import os
+import re
+
+import pytest
+
+import fast_parser
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def seed_categories():
+    """Category names from the seed data in migration.sql"""
+    with open(os.path.join(ROOT, "migration.sql"), encoding="utf-8") as f:
+        sql = f.read()
+    block = sql[sql.index("INSERT INTO category_budgets"):]
+    block = block[:block.index(";")]
+    return [name.replace("''", "'") for name in re.findall(r"\('((?:[^']|'')*)', '[A-Z]+'", block)]
+
+CATEGORIES = seed_categories()
+
+def expense(text):
+    parsed = fast_parser.parse(text, CATEGORIES)
+    assert parsed and parsed["tool"] == "log_expense", parsed
+    args = parsed["args"]
+    return args["amount"], args["category"], args["paid_by"]
+
+@pytest.mark.parametrize("text, amount", [
+    ("groceries 1200", 1200), ("groceries 1,200", 1200), ("groceries 1,20,000", 120000), ("groceries 1.5k", 1500),
+    ("groceries ৳1200", 1200), ("groceries 1200 tk", 1200), ("groceries 1200/-", 1200), ("বাজার ১২০০", 1200),
+])
+def test_amount_formats(text, amount):
+    assert expense(text)[0] == amount
+
+@pytest.mark.parametrize("text, payer", [
+    ("rent 15000", "Hadi"), ("rent 15000 paid by Ruhi", "Ruhi"), ("rent 15000 by ruhi", "Ruhi"),
+    ("ruhi paid rent 15000", "Ruhi"), ("rent 15000 ruhi", "Ruhi"), ("রুহি বাজার ৫০০", "Ruhi"),
+])
+def test_payer(text, payer):
+    assert expense(text)[2] == payer
+
+def test_commute_category_follows_the_payer():
+    assert expense("taxi 500 ruhi")[1:] == ("Office Commute (Ruhi)", "Ruhi")
+    assert expense("rickshaw 60")[1:] == ("Office Commute (Hadi)", "Hadi")
+
+def test_income():
+    parsed = fast_parser.parse("salary 85000", CATEGORIES)
+    assert parsed["tool"] == "log_income"
+    assert parsed["args"]["source"] == "Salary"
+    assert parsed["args"]["amount"] == 85000
+
+@pytest.mark.parametrize("text", [
+    # Negations, corrections and questions
+    "don't log groceries 1200", "undo groceries 1200", "cancel rent 15000", "groceries 1200?",
+    # Words that no category accounts for, or two payers
+    "groceries asdf 1200", "rent 15000 hadi ruhi",
+    # Income wording next to a category: money in or out?
+    "refund groceries 300", "bonus groceries 300", "received 500 rickshaw", "driver salary 12000",
+    # "from/to <name>" may be the other party rather than the payer
+    "received 500 from ruhi", "food 500 to ruhi", "rickshaw 80 from hadi",
+    # Several or no amounts, several transactions
+    "groceries 500 600", "groceries", "groceries 500 and rent 15000",
+])
+def test_falls_back_to_the_model(text):
+    assert fast_parser.parse(text, CATEGORIES) is None
+
+def test_confidence_drops_with_filler_words():
+    plain = fast_parser.parse("groceries 1200", CATEGORIES)
+    padded = fast_parser.parse("groceries cash today 1200", CATEGORIES)
+    assert plain["confidence"] == 1.0
+    assert padded is None or padded["confidence"] < plain["confidence"]
+
+def test_match_category_needs_every_word():
+    assert fast_parser.match_category(["groceries", "cash"], CATEGORIES, "Hadi")[0] == "Groceries & Food"
+    assert fast_parser.match_category(["groceries", "asdf"], CATEGORIES, "Hadi")[0] is None
+    assert fast_parser.match_category(["groceries", "rent"], CATEGORIES, "Hadi")[0] is None
+
+def corpus():
+    with open(os.path.join(ROOT, "benchmarks", "fast_parser_corpus.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+@pytest.mark.parametrize("example", corpus(), ids=lambda e: e["text"])
+def test_corpus_has_no_wrong_hits(example):
+    parsed = fast_parser.parse(example["text"], CATEGORIES)
+    if parsed is None:
+        return
+    assert example.get("fast_path", True)
+    expected, = example["transactions"]
+    assert parsed["tool"] == expected["tool"]
+    assert parsed["args"]["amount"] == expected["amount"]
+    if parsed["tool"] == "log_expense":
+        assert (parsed["args"]["category"], parsed["args"]["paid_by"]) == (expected["category"], expected["paid_by"])
@@ -0,0 +1,88 @@
+import random
+
+from history_state import history_key, keep_in_history, new_history_state, patch_kept_row
+
+def row(id, date, amount=100):
+    return {"id": id, "date": date, "amount": amount}
+
+def state(rows, has_more=True, start=None):
+    """History state after loading `rows` (newest first)"""
+    return {**new_history_state(start), "loaded": 1, "rows": sorted(rows, key=history_key, reverse=True), "has_more": has_more}
+
+def ids(s):
+    return [r["id"] for r in s["rows"]]
+
+KEPT = [row("c", "2026-10-03"), row("m", "2026-10-02"), row("k", "2026-10-01")]
+
+def test_new_row_inside_the_kept_range_is_inserted_in_order():
+    s = state(KEPT)
+    keep_in_history(s, row("n", "2026-10-02"))
+    keep_in_history(s, row("z", "2026-10-04"))
+    assert ids(s) == ["z", "c", "n", "m", "k"]
+
+def test_row_past_the_cursor_waits_for_load_more():
+    s = state(KEPT)
+    keep_in_history(s, row("a", "2026-10-01"))  # Same day as the cursor row, lower id: on the next page
+    keep_in_history(s, row("x", "2026-09-30"))
+    assert ids(s) == ["c", "m", "k"]
+    keep_in_history(s, row("z", "2026-10-01"))  # Same day, higher id: above the cursor
+    assert ids(s) == ["c", "m", "z", "k"]
+
+def test_older_row_is_kept_once_every_page_is_loaded():
+    s = state(KEPT, has_more=False)
+    keep_in_history(s, row("x", "2026-09-30"))
+    assert ids(s) == ["c", "m", "k", "x"]
+
+def test_row_newer_than_the_jumped_to_month_is_left_out():
+    s = state(KEPT, start="2026-10-03")
+    keep_in_history(s, row("z", "2026-10-04"))
+    assert ids(s) == ["c", "m", "k"]
+
+def test_editing_the_cursor_row_in_place_keeps_it():
+    s = state(KEPT)
+    patch_kept_row(s, "k", {"amount": 5})
+    assert ids(s) == ["c", "m", "k"]
+    assert s["rows"][-1]["amount"] == 5
+
+def test_edit_moving_a_row_past_the_cursor_drops_it():
+    s = state(KEPT)
+    patch_kept_row(s, "c", {"date": "2026-09-01"})
+    assert ids(s) == ["m", "k"]
+
+def test_delete_and_unknown_ids():
+    s = state(KEPT)
+    patch_kept_row(s, "m")
+    patch_kept_row(s, "missing", {"amount": 1})
+    assert ids(s) == ["c", "k"]
+
+def test_kept_rows_are_always_everything_above_the_cursor():
+    """After any mix of adds, edits and deletes, Load more from the last kept row fetches exactly the rest"""
+    rng = random.Random(7)
+    day = lambda: f"2026-10-{rng.randint(1, 20):02d}"
+    db = {f"r{i}": row(f"r{i}", day()) for i in range(30)}
+    newest = sorted(db.values(), key=history_key, reverse=True)
+    s = state([dict(r) for r in newest[:10]])
+    for step in range(300):
+        op = rng.choice(("add", "edit", "delete"))
+        if op == "add":
+            new = row(f"n{step}", day())
+            db[new["id"]] = new
+            keep_in_history(s, dict(new))
+        elif s["rows"]:
+            target = rng.choice(s["rows"])["id"]
+            if op == "edit":
+                db[target] = {**db[target], "date": day()}
+                patch_kept_row(s, target, {"date": db[target]["date"]})
+            else:
+                del db[target]
+                patch_kept_row(s, target)
+        if s["rows"]:
+            cursor = history_key(s["rows"][-1])
+            expected = sorted((r for r in db.values() if history_key(r) >= cursor), key=history_key, reverse=True)
+            assert s["rows"] == expected
+
+def test_nothing_is_kept_after_every_kept_row_was_deleted():
+    s = state(KEPT[:1])
+    patch_kept_row(s, "c")
+    keep_in_history(s, row("z", "2026-10-04"))  # Would become the cursor and skip the rows not loaded yet
+    assert ids(s) == []
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import data_access
+import idempotency
+
+def days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+def store(rows=()):
+    return idempotency.IdempotencyStore(data_access.Repository(data_access.MemoryBackend({idempotency.TABLE: rows})))
+
+def test_claim_is_true_once_per_message_sid_across_processes():
+    first = store()
+    second = idempotency.IdempotencyStore(first.repository)  # Another worker, same table
+    assert first.claim("SM1")
+    assert not first.claim("SM1")
+    assert not second.claim("SM1")
+    assert second.claim("SM2")
+
+def test_prune_removes_only_rows_past_retention():
+    messages = store([
+        {"message_sid": "old", "reply": "ok", "created_at": days_ago(idempotency.RETENTION_DAYS + 1)},
+        {"message_sid": "recent", "reply": "ok", "created_at": days_ago(1)},
+    ])
+    assert messages.prune() == 1
+    assert [row["message_sid"] for row in messages.repository.backend.tables[idempotency.TABLE]] == ["recent"]
+
+def test_prune_without_the_table_is_a_no_op():
+    assert idempotency.IdempotencyStore().prune() == 0
+
+def test_webhook_prunes_old_rows_periodically(monkeypatch):
+    webhook_agent = pytest.importorskip("webhook_agent", exc_type=ImportError)
+    messages = store([{"message_sid": "old", "reply": "ok", "created_at": days_ago(idempotency.RETENTION_DAYS + 1)}])
+    monkeypatch.setattr(webhook_agent, "dedup_store", messages)
+
+    async def run_briefly():
+        pruner = asyncio.create_task(webhook_agent.prune_worker(0.01))
+        await asyncio.sleep(0.05)
+        messages.repository.backend.tables[idempotency.TABLE].append(
+            {"message_sid": "older", "reply": "ok", "created_at": days_ago(idempotency.RETENTION_DAYS + 2)})
+        await asyncio.sleep(0.05)
+        pruner.cancel()
+
+    asyncio.run(run_briefly())
+    assert messages.repository.backend.tables[idempotency.TABLE] == []
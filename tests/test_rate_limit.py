@@ -0,0 +1,72 @@
+import math
+import threading
+import time
+
+import pytest
+
+import rate_limit
+
+def test_infinite_timeout_waits_for_a_slot():
+    limiter = rate_limit.RateLimiter(rate_per_minute=6000, burst=5, max_in_flight=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(timeout=math.inf), acquired.set()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not acquired.is_set()
+    limiter.release()
+    waiter.join(1)
+    assert acquired.is_set()
+    assert limiter.stats()["rejected"] == 0
+
+def test_burst_then_wait_for_refill():
+    limiter = rate_limit.RateLimiter(rate_per_minute=60 * 20, burst=3, max_in_flight=10, max_wait=5)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.03  # The fourth waited ~1/20 s for a token
+    assert limiter.stats()["queued"] == 1
+
+def test_rejected_at_the_deadline():
+    limiter = rate_limit.RateLimiter(rate_per_minute=1, burst=1, max_in_flight=10)
+    limiter.acquire()
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        limiter.acquire(timeout=0.05)
+    stats = limiter.stats()
+    assert (stats["rejected"], stats["in_flight"], stats["waiting"]) == (1, 1, 0)
+
+def test_rejected_while_waiting_for_a_slot_spends_no_tokens():
+    taken = []
+    limiter = rate_limit.RateLimiter(max_in_flight=1, shared=lambda cost: taken.append(cost) or 0)
+    limiter.acquire()
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        limiter.acquire(timeout=0.05)
+    assert taken == [1]
+
+def test_slot_is_released_when_tokens_time_out():
+    limiter = rate_limit.RateLimiter(max_in_flight=1, shared=lambda cost: 60)
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        limiter.acquire(timeout=0.05)
+    assert limiter.stats()["in_flight"] == 0
+
+def test_shared_bucket_failure_falls_back_to_the_local_share():
+    def unavailable(cost):
+        raise ConnectionError("take_rate_tokens is not deployed")
+    limiter = rate_limit.RateLimiter(rate_per_minute=1, burst=4, processes=2, shared=unavailable)
+    limiter.acquire()
+    limiter.release()
+    limiter.acquire()
+    limiter.release()
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        limiter.acquire(timeout=0.05)  # This process's half of the burst is spent
+    assert limiter.stats()["shared_failures"] >= 3  # Every attempt tries the shared bucket first
+
+def test_slot_counts_errors_and_frees_the_slot():
+    limiter = rate_limit.RateLimiter(max_in_flight=1)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("model error")
+    with limiter.slot(timeout=0.05):
+        pass
+    stats = limiter.stats()
+    assert (stats["errors"], stats["calls"], stats["in_flight"]) == (1, 2, 0)
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import data_access
+import rate_limit
+import response_cache
+
+# normalize
+
+@pytest.mark.parametrize("a, b", [
+    ("Rickshaw 60", "rickshaw 60"),
+    ("rickshaw   60 ", "rickshaw 60"),
+    ("rickshaw 60!", "rickshaw 60"),
+    ("groceries ৳1,200.00", "groceries 1200"),
+    ("groceries 1.2k tk", "groceries 1200"),
+    ("বাজার ১২০০", "বাজার 1200"),
+])
+def test_normalize_treats_variants_as_the_same_message(a, b):
+    assert response_cache.normalize(a) == response_cache.normalize(b)
+
+@pytest.mark.parametrize("a, b", [("rickshaw 60", "rickshaw 80"), ("bus 40", "bus 40 by ruhi"), ("groceries 1.25", "groceries 1.2")])
+def test_normalize_keeps_different_messages_apart(a, b):
+    assert response_cache.normalize(a) != response_cache.normalize(b)
+
+# ResponseCache
+
+def test_get_returns_copies_of_the_recorded_calls():
+    cache = response_cache.ResponseCache()
+    cache.set("bus 40", [("log_expense", {"item": "bus", "amount": 40})], "ok")
+    calls, reply = cache.get("Bus 40")
+    calls[0][1]["amount"] = 0
+    assert cache.get("bus 40") == ([("log_expense", {"item": "bus", "amount": 40})], "ok")
+    assert cache.stats()["hits"] == 2
+
+def test_entries_expire_and_the_oldest_is_evicted():
+    expired = response_cache.ResponseCache(ttl=-1)
+    expired.set("bus 40", [("log_expense", {})], "ok")
+    assert expired.get("bus 40") is None
+
+    small = response_cache.ResponseCache(max_entries=2)
+    for text in ("a 1", "b 2", "c 3"):
+        small.set(text, [("log_expense", {})], text)
+    assert small.get("a 1") is None
+    assert small.get("c 3") is not None
+
+# Replays through agent_engine, on a later day
+
+class Clock(datetime):
+    today = datetime(2026, 10, 18, 9, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.today
+
+class DatingModel:
+    """Extraction stub: one bus expense, dated the day before "now" when the message says yesterday"""
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        date = (Clock.today - timedelta(days=1)).strftime('%Y-%m-%d') if "yesterday" in prompt else None
+        transaction = {"type": "expense", "item": "Bus", "amount": 40, "category": "Other", "paid_by": "Hadi", "date": date}
+        return SimpleNamespace(text=json.dumps({"results": [{"message": 1, "transactions": [transaction]}]}))
+
+@pytest.fixture
+def engine(monkeypatch):
+    agent_engine = pytest.importorskip("agent_engine", exc_type=ImportError)
+    backend = data_access.MemoryBackend({"category_budgets": [{"id": 1, "category": "Other", "group_name": "OTHERS", "limit_amount": 1, "icon": "📦"}]})
+    model = DatingModel()
+    monkeypatch.setattr(agent_engine, "repository", data_access.Repository(backend))
+    monkeypatch.setattr(agent_engine, "gemini_limiter", rate_limit.RateLimiter())
+    monkeypatch.setattr(agent_engine, "tool_call_cache", response_cache.ResponseCache())
+    monkeypatch.setattr(agent_engine, "configure_genai", lambda api_key: None)
+    monkeypatch.setattr(agent_engine, "get_extraction_model", lambda api_key: model)
+    monkeypatch.setattr(agent_engine, "datetime", Clock)
+    monkeypatch.setattr(Clock, "today", datetime(2026, 10, 18, 9, 0))
+
+    def send(text):
+        agent_engine.process_message(text, api_key="key", use_fast_path=False, mode="structured")
+        return [row["date"] for row in backend.tables.get("expenses", [])]
+
+    return SimpleNamespace(send=send, model=model)
+
+def test_replay_on_a_later_day_uses_that_day(engine):
+    assert engine.send("bus 40") == ["2026-10-18"]
+    Clock.today = datetime(2026, 10, 19, 9, 0)
+    assert engine.send("bus 40") == ["2026-10-18", "2026-10-19"]
+    assert engine.model.calls == 1
+
+def test_message_with_its_own_date_is_not_replayed(engine):
+    assert engine.send("bus 40 yesterday") == ["2026-10-17"]
+    Clock.today = datetime(2026, 10, 19, 9, 0)
+    # A replay would have re-used 2026-10-17 (or today); the model resolves "yesterday" again
+    assert engine.send("bus 40 yesterday") == ["2026-10-17", "2026-10-18"]
+    assert engine.model.calls == 2
@@ -1,33 +1,129 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from xml.sax.saxutils import escape
 from fastapi import FastAPI, Form, Response
 import uvicorn
 import agent_engine
+import idempotency
+import messaging
+import supabase_client
 
-app = FastAPI()
+# Bounded background processing: the webhook only enqueues, workers run the (blocking)
+# agent in a thread pool and reply through the outbound sender.
+WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "4"))
+QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "100"))
+BUSY_REPLY = "Sorry, I'm handling a lot of messages right now. Please try again in a minute."
+# How often processed_messages rows past idempotency.RETENTION_DAYS are deleted
+PRUNE_INTERVAL_SECONDS = float(os.environ.get("WEBHOOK_PRUNE_INTERVAL", str(6 * 3600)))
+
+# Pluggable pieces (benchmarks/webhook_load_benchmark.py swaps these for stubs)
+message_handler = agent_engine.process_message
+message_sender = None  # Defaults to messaging.default_sender() at startup
+# Twilio retries webhooks it thinks timed out; repeats of a MessageSid are acknowledged, not re-run
+dedup_store = idempotency.IdempotencyStore(agent_engine.repository if agent_engine.SUPABASE_URL else None)
+
+async def message_worker(queue, executor):
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await queue.get()
+        try:
+            handler = functools.partial(message_handler, job["body"], message_id=job["sid"])
+            try:
+                reply = await loop.run_in_executor(executor, handler)
+            except Exception as e:
+                reply = f"Sorry, I had trouble processing that: {str(e)}"
+            if job["sid"]:
+                await loop.run_in_executor(executor, dedup_store.record_reply, job["sid"], reply)
+            await loop.run_in_executor(executor, message_sender.send, job["to"], reply, job["from"])
+        except Exception as e:
+            print(f"Failed to reply to {job['to']}: {e}")
+        finally:
+            queue.task_done()
+
+async def prune_worker(interval):
+    """Delete old de-duplication rows at startup and then every `interval` seconds"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            removed = await loop.run_in_executor(None, dedup_store.prune)
+            if removed:
+                print(f"Pruned {removed} processed message(s)")
+        except Exception as e:
+            print(f"Pruning processed messages failed: {e}")
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def lifespan(app):
+    global message_sender
+    # Open the pooled Supabase session once and reuse its keep-alive connections for every message
+    supabase_client.get_session()
+    if message_sender is None:
+        message_sender = messaging.default_sender()
+    app.state.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="agent")
+    workers = [asyncio.create_task(message_worker(app.state.queue, executor)) for _ in range(WORKERS)]
+    pruner = asyncio.create_task(prune_worker(PRUNE_INTERVAL_SECONDS))
+    yield
+    pruner.cancel()
+    # Finish what was already acknowledged before shutting down
+    await app.state.queue.join()
+    for worker in workers:
+        worker.cancel()
+    executor.shutdown(wait=True)
+    supabase_client.close_session()
+
+app = FastAPI(lifespan=lifespan)
+
+def twiml(message=None):
+    """TwiML response; without a message Twilio sends nothing back right away"""
+    body = f"<Message>{escape(message)}</Message>" if message else ""
+    content = f"""<?xml version="1.0" encoding="UTF-8"?>
+    <Response>{body}</Response>"""
+    return Response(content=content, media_type="text/xml")
 
 @app.post("/whatsapp")
-async def whatsapp_webhook(Body: str = Form(...), From: str = Form(...)):
+async def whatsapp_webhook(Body: str = Form(...), From: str = Form(...), To: str = Form(None), MessageSid: str = Form(None)):
     """
     Twilio sends a POST request to this endpoint whenever a WhatsApp message is received.
     Body: The text content of the message.
     From: The sender's WhatsApp number.
+    To: Our WhatsApp number (used as the sender of the reply).
+    MessageSid: Twilio's id for the message, identical on retries.
+
+    The message is queued for the agent and acknowledged immediately so Twilio's webhook
+    timeout is never hit; the reply is delivered afterwards through message_sender.
     """
     print(f"Received message from {From}: {Body}")
 
-    # 1. Process the message using our AI Agent Engine (agent_engine.py)
-    # This automatically logs to Supabase if it extracts a transaction.
+    if MessageSid:
+        claimed = await asyncio.get_running_loop().run_in_executor(None, dedup_store.claim, MessageSid)
+        if not claimed:
+            # Same response as the first delivery: the reply is (or was) sent by the worker
+            print(f"Duplicate delivery of {MessageSid}; not processing again")
+            return twiml()
+
     try:
-        response_text = agent_engine.process_message(Body)
-    except Exception as e:
-        response_text = f"Sorry, I had trouble processing that: {str(e)}"
-
-    # 2. Respond to Twilio with TwiML (XML)
-    # This text will be sent back to the user via WhatsApp.
-    twiml_response = f"""<?xml version="1.0" encoding="UTF-8"?>
-    <Response>
-        <Message>{response_text}</Message>
-    </Response>"""
-
-    return Response(content=twiml_response, media_type="text/xml")
+        app.state.queue.put_nowait({"body": Body, "to": From, "from": To, "sid": MessageSid})
+    except asyncio.QueueFull:
+        if MessageSid:
+            await asyncio.get_running_loop().run_in_executor(None, dedup_store.release, MessageSid)
+        return twiml(BUSY_REPLY)
+
+    return twiml()
+
+@app.get("/metrics")
+async def metrics():
+    """Queue depth, Gemini limiter, response cache and de-duplication counters"""
+    return {
+        "queue_depth": app.state.queue.qsize(),
+        "gemini": agent_engine.gemini_limiter.stats(),
+        "response_cache": agent_engine.tool_call_cache.stats(),
+        "duplicates": dedup_store.duplicates,
+        "database": agent_engine.repository.stats(),
+    }
 
 if __name__ == "__main__":
     # To run this locally: python webhook_agent.py